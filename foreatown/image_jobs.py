@@ -0,0 +1,109 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from foreatown.models import GatherRoom, GatherRoomImage, ImageUploadJob
+from users.authentication import invalidate_cached_user
+from users.models import User
+from utils import create_image_variants, get_s3_client
+import logging, os
+
+logger = logging.getLogger(__name__)
+
+def spool_image_file(image_file):
+    # Park the request's file on local disk, the worker sends it to S3 under object_key
+    object_key = get_s3_client().new_object_key()
+    spool_dir = getattr(settings, 'IMAGE_UPLOAD_SPOOL_DIR')
+    os.makedirs(spool_dir, exist_ok=True)
+    spool_path = os.path.join(spool_dir, object_key)
+    with open(spool_path, 'wb') as spool_file:
+        for chunk in image_file.chunks():
+            spool_file.write(chunk)
+    return {'object_key': object_key, 'spool_path': spool_path, 'content_type': image_file.content_type}
+
+def uploaded_image(object_key):
+    # An object the client already put in S3 through a presigned POST, only its variants are pending
+    return {'object_key': object_key, 'spool_path': None, 'content_type': None}
+
+def enqueue_image_upload_jobs(target_type, image_uploads):
+    # image_uploads is a list of (target_id, image_upload) pairs, saved in the caller's transaction.
+    # Presigned uploads have no spool file, their object keys can not be attached again after this
+    get_s3_client().consume_issued_uploads([image_upload['object_key'] for _, image_upload in image_uploads if image_upload['spool_path'] is None])
+    return ImageUploadJob.objects.bulk_create([
+        ImageUploadJob(target_type=target_type, target_id=target_id, **image_upload)
+        for target_id, image_upload in image_uploads
+    ])
+
+def claim_image_upload_jobs(batch_size):
+    # A job is claimed by pushing next_attempt_at past the lease, so a crashed worker's jobs
+    # become due again once the lease runs out and two workers never run the same attempt
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=getattr(settings, 'IMAGE_UPLOAD_JOB_LEASE'))
+    due_jobs = ImageUploadJob.objects.filter(status=ImageUploadJob.PENDING, next_attempt_at__lte=now).order_by('next_attempt_at')[:batch_size]
+    claimed_jobs = []
+    for job in due_jobs:
+        claimed = ImageUploadJob.objects.filter(id=job.id, status=ImageUploadJob.PENDING, next_attempt_at=job.next_attempt_at).update(
+            next_attempt_at=lease_until,
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+           job.next_attempt_at = lease_until
+           job.attempts += 1
+           claimed_jobs.append(job)
+    return claimed_jobs
+
+def run_image_upload_job(job):
+    s3_client = get_s3_client()
+    try:
+        if job.spool_path:
+           with open(job.spool_path, 'rb') as spool_file:
+               s3_client.upload_fileobj(spool_file, job.object_key, job.content_type)
+        img_url = s3_client.object_url(job.object_key)
+        complete_image_upload_target(job, img_url, create_image_variants(img_url))
+        ImageUploadJob.objects.filter(id=job.id).update(status=ImageUploadJob.DONE, last_error=None)
+        remove_spool_file(job)
+        return True
+    except Exception as e:
+        logger.exception('Image upload job %s failed on attempt %s', job.id, job.attempts)
+        if job.attempts >= getattr(settings, 'IMAGE_UPLOAD_JOB_MAX_ATTEMPTS'):
+           ImageUploadJob.objects.filter(id=job.id).update(status=ImageUploadJob.FAILED, last_error=repr(e))
+           fail_image_upload_target(job)
+           # A failed job is never retried, its spooled file would only fill the disk
+           remove_spool_file(job)
+        else:
+           retry_delay = getattr(settings, 'IMAGE_UPLOAD_JOB_RETRY_DELAY') * 2 ** (job.attempts - 1)
+           ImageUploadJob.objects.filter(id=job.id).update(next_attempt_at=timezone.now() + timedelta(seconds=retry_delay), last_error=repr(e))
+        return False
+
+def remove_spool_file(job):
+    if job.spool_path and os.path.exists(job.spool_path):
+       os.remove(job.spool_path)
+
+def complete_image_upload_target(job, img_url, variant_urls):
+    if job.target_type == ImageUploadJob.GATHER_ROOM_IMAGE:
+       GatherRoomImage.objects.filter(id=job.target_id).update(
+           img_url=img_url,
+           medium_img_url=variant_urls.get('medium'),
+           thumbnail_img_url=variant_urls.get('thumbnail'),
+           status=GatherRoomImage.READY
+       )
+       touch_gather_room_of_image(job.target_id)
+    if job.target_type == ImageUploadJob.USER_PROFILE:
+       newer_jobs = ImageUploadJob.objects.filter(target_type=job.target_type, target_id=job.target_id, id__gt=job.id)
+       if not newer_jobs.exists():
+          User.objects.filter(id=job.target_id).update(
+              profile_img_url=img_url,
+              profile_img_medium_url=variant_urls.get('medium'),
+              profile_img_thumbnail_url=variant_urls.get('thumbnail'),
+              updated_at=timezone.now()
+          )
+          invalidate_cached_user(job.target_id)
+
+def fail_image_upload_target(job):
+    if job.target_type == ImageUploadJob.GATHER_ROOM_IMAGE:
+       GatherRoomImage.objects.filter(id=job.target_id).update(status=GatherRoomImage.FAILED)
+       touch_gather_room_of_image(job.target_id)
+
+def touch_gather_room_of_image(gather_room_image_id):
+    # The room's images are part of its response, so its validators must change with them
+    GatherRoom.objects.filter(gather_room_images=gather_room_image_id).update(updated_at=timezone.now())
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from wsgiref.util import setup_testing_defaults
+import time
+
+@contextmanager
+def database_policy(alias, **policy):
+    # Swaps connection settings in place, the connection is reopened so CONN_MAX_AGE applies
+    settings_dict = connections[alias].settings_dict
+    previous_policy = {name: settings_dict.get(name) for name in policy}
+    connections[alias].close()
+    settings_dict.update(policy)
+    try:
+        yield
+    finally:
+        connections[alias].close()
+        settings_dict.update(previous_policy)
+
+class Command(BaseCommand):
+    help = 'Compare per-request overhead of a new connection and ATOMIC_REQUESTS per request against the persistent, non-atomic policy'
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per path and policy')
+        parser.add_argument('--path', nargs='*', default=['/foreatown/gather-room/list', '/users/country/list'], help='Read-only paths to request')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+    def handle(self, *args, **options):
+        handler = WSGIHandler()
+        policies = (
+            ('per-request connection, ATOMIC_REQUESTS', {'CONN_MAX_AGE': 0, 'ATOMIC_REQUESTS': True}),
+            ('persistent connection, no request transaction', {'CONN_MAX_AGE': connections[options['database']].settings_dict.get('CONN_MAX_AGE') or 60, 'ATOMIC_REQUESTS': False}),
+        )
+        for label, policy in policies:
+            with database_policy(options['database'], **policy):
+                opened_connections = []
+                on_connection_created = lambda connection, **kwargs: opened_connections.append(connection.alias)
+                connection_created.connect(on_connection_created, weak=False)
+                try:
+                    # The first round loads URLconfs and caches, it is not counted
+                    for path in options['path']:
+                        self.request(handler, path)
+                    opened_connections.clear()
+                    started_at = time.perf_counter()
+                    for _ in range(options['requests']):
+                        for path in options['path']:
+                            self.request(handler, path)
+                    elapsed = time.perf_counter() - started_at
+                finally:
+                    connection_created.disconnect(on_connection_created)
+            request_count = options['requests'] * len(options['path'])
+            self.stdout.write(f'{label}: {elapsed * 1000 / request_count:.2f} ms/request, {len(opened_connections)} connections opened for {request_count} requests')
+    def request(self, handler, path):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': ''}
+        setup_testing_defaults(environ)
+        response = handler(environ, lambda status, headers: None)
+        try:
+            b''.join(response)
+        finally:
+            # Sends request_finished, which closes connections past CONN_MAX_AGE
+            response.close()
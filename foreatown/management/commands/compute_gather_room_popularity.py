@@ -0,0 +1,48 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from foreatown.models import GatherRoom, UserGatherRoomLike, UserGatherRoomReservation
+from foreatown.serializers import invalidate_gather_room_popularity_cache
+import math
+
+class Command(BaseCommand):
+    help = 'Recompute GatherRoom.popularity_score from recent reservations, likes and ratings'
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk update and transaction')
+    def handle(self, *args, **options):
+        now = timezone.now()
+        weights = getattr(settings, 'GATHER_ROOM_POPULARITY_WEIGHTS')
+        half_life = getattr(settings, 'GATHER_ROOM_POPULARITY_HALF_LIFE_DAYS')
+        window_start = now - timedelta(days=getattr(settings, 'GATHER_ROOM_POPULARITY_WINDOW_DAYS'))
+        scores = defaultdict(float)
+        # Events are counted per room and day, every day bucket decays from its midpoint
+        for model, weight in ((UserGatherRoomReservation, weights['reservation']), (UserGatherRoomLike, weights['like'])):
+            daily_counts = (model.objects.filter(created_at__gte=window_start)
+                            .annotate(day=TruncDate('created_at'))
+                            .values('gather_room_id', 'day').annotate(count=Count('id')))
+            for daily_count in daily_counts:
+                age_days = max((timezone.localdate(now) - daily_count['day']).days - 0.5, 0.0)
+                scores[daily_count['gather_room_id']] += weight * daily_count['count'] * 0.5 ** (age_days / half_life)
+        rated_gather_rooms = GatherRoom.objects.filter(rating_count__gt=0).values_list('id', 'avg_rating', 'rating_count')
+        for gather_room_id, avg_rating, rating_count in rated_gather_rooms.iterator():
+            scores[gather_room_id] += weights['rating'] * avg_rating * math.log1p(rating_count)
+        # Only rows whose rounded score moved are written. Rooms that dropped out are reset to 0.
+        current_scores = dict(GatherRoom.objects.filter(popularity_score__gt=0).values_list('id', 'popularity_score').iterator())
+        changed_scores = {gather_room_id: 0.0 for gather_room_id in current_scores if gather_room_id not in scores}
+        for gather_room_id, score in scores.items():
+            if round(score, 6) != current_scores.get(gather_room_id, 0.0):
+               changed_scores[gather_room_id] = round(score, 6)
+        # updated_at is left alone, the score is not part of any response and must not change the validators.
+        # Every batch is its own short transaction instead of one lock over the whole table.
+        changed_gather_rooms = [GatherRoom(id=gather_room_id, popularity_score=score) for gather_room_id, score in changed_scores.items()]
+        for start in range(0, len(changed_gather_rooms), options['batch_size']):
+            with transaction.atomic():
+                GatherRoom.objects.bulk_update(changed_gather_rooms[start:start + options['batch_size']], ['popularity_score'])
+        if changed_gather_rooms:
+           invalidate_gather_room_popularity_cache()
+        self.stdout.write(self.style.SUCCESS(f'Computed popularity for {len(scores)} gather rooms, updated {len(changed_gather_rooms)}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from foreatown.models import GatherRoom
+from utils import encode_geohash, geocode_address
+
+class Command(BaseCommand):
+    help = 'Geocode offline gather rooms that have an address but no location yet'
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Geocode every offline gather room again')
+    def handle(self, *args, **options):
+        gather_room_queryset = GatherRoom.objects.filter(is_online=False).exclude(address__isnull=True).exclude(address='')
+        if not options['all']:
+           gather_room_queryset = gather_room_queryset.filter(geohash__isnull=True)
+        geocoded = 0
+        for gather_room_id, address in gather_room_queryset.values_list('id', 'address').iterator():
+            coordinates = geocode_address(address)
+            if coordinates is None:
+               continue
+            latitude, longitude = coordinates
+            GatherRoom.objects.filter(id=gather_room_id).update(latitude=latitude, longitude=longitude, geohash=encode_geohash(latitude, longitude), updated_at=timezone.now())
+            geocoded += 1
+        self.stdout.write(self.style.SUCCESS(f'Geocoded {geocoded} gather rooms'))
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from foreatown.image_jobs import claim_image_upload_jobs, run_image_upload_job
+import time
+
+class Command(BaseCommand):
+    help = 'Upload spooled images to S3, create their variants and retry failed jobs with backoff'
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the jobs that are due now and exit')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'AWS_S3_UPLOAD_WORKERS'))
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when no job is due')
+    def handle(self, *args, **options):
+        while True:
+            jobs = claim_image_upload_jobs(options['batch_size'])
+            if jobs:
+               succeeded = sum(self.run_jobs(jobs, options['concurrency']))
+               self.stdout.write(f'Processed {len(jobs)} image upload jobs, {succeeded} succeeded')
+               continue
+            if options['once']:
+               break
+            time.sleep(options['poll_interval'])
+    def run_jobs(self, jobs, concurrency):
+        if concurrency <= 1:
+           return [run_image_upload_job(job) for job in jobs]
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='image-upload-job') as executor:
+            return list(executor.map(self.run_job_in_thread, jobs))
+    def run_job_in_thread(self, job):
+        try:
+            return run_image_upload_job(job)
+        finally:
+            connections.close_all()
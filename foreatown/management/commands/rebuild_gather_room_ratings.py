@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from foreatown.models import GatherRoom, GatherRoomReview
+
+class Command(BaseCommand):
+    help = 'Rebuild GatherRoom rating_sum, rating_count and avg_rating from the live reviews'
+    def add_arguments(self, parser):
+        parser.add_argument('--gather-room-id', type=int, nargs='*', help='Only rebuild the given gather rooms')
+    def handle(self, *args, **options):
+        gather_room_reviews = (GatherRoomReview.objects.filter(gather_room=OuterRef('pk'), deleted_at__isnull=True)
+                               .values('gather_room'))
+        gather_room_queryset = GatherRoom.objects.all()
+        if options['gather_room_id']:
+           gather_room_queryset = gather_room_queryset.filter(id__in=options['gather_room_id'])
+        updated = gather_room_queryset.update(
+            avg_rating=Coalesce(Subquery(gather_room_reviews.annotate(avg_rating=Avg('rating')).values('avg_rating')), 0.0),
+            rating_sum=Coalesce(Subquery(gather_room_reviews.annotate(rating_sum=Sum('rating')).values('rating_sum')), 0),
+            rating_count=Coalesce(Subquery(gather_room_reviews.annotate(rating_count=Count('id')).values('rating_count')), 0),
+            updated_at=timezone.now()
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {updated} gather rooms'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from foreatown.models import GatherRoom, GatherRoomCategory, UserGatherRoomReservation
+from foreatown.serializers import invalidate_gather_room_list_cache
+
+class Command(BaseCommand):
+    help = 'Rebuild GatherRoom.participants_count from the reservation table'
+    def add_arguments(self, parser):
+        parser.add_argument('--gather-room-id', type=int, nargs='*', help='Only rebuild the given gather rooms')
+    def handle(self, *args, **options):
+        reservation_count = (UserGatherRoomReservation.objects.filter(gather_room=OuterRef('pk'))
+                             .values('gather_room').annotate(count=Count('id')).values('count'))
+        gather_room_queryset = GatherRoom.objects.all()
+        if options['gather_room_id']:
+           gather_room_queryset = gather_room_queryset.filter(id__in=options['gather_room_id'])
+        updated = gather_room_queryset.update(participants_count=Coalesce(Subquery(reservation_count), 0), updated_at=timezone.now())
+        invalidate_gather_room_list_cache(*GatherRoomCategory.objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt participants_count for {updated} gather rooms'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from foreatown.models import GatherRoom, GatherRoomReview, UserGatherRoomLike, UserGatherRoomReservation
+
+class Command(BaseCommand):
+    # Meant for databases that stopped at migration foreatown 0003, so it only touches columns that
+    # exist before it. Review ratings and like counts are filled from the remaining rows by later migrations
+    help = 'Delete duplicate reservations, reviews and likes of a user on a gather room, keeping the oldest row'
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the rows that would be deleted')
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model in [UserGatherRoomReservation, GatherRoomReview, UserGatherRoomLike]:
+                duplicate_ids = self.duplicate_ids(model)
+                self.stdout.write(f'{model.__name__}: {len(duplicate_ids)} duplicate rows {duplicate_ids}')
+                if options['dry_run'] or not duplicate_ids:
+                   continue
+                gather_room_ids = set(model.objects.filter(id__in=duplicate_ids).values_list('gather_room_id', flat=True))
+                model.objects.filter(id__in=duplicate_ids).delete()
+                if model is UserGatherRoomReservation:
+                   self.recount_participants(gather_room_ids)
+        if not options['dry_run']:
+           self.stdout.write(self.style.SUCCESS('Removed duplicate rows, run migrate again'))
+    def duplicate_ids(self, model):
+        duplicates = (model.objects.values('user', 'gather_room')
+                      .annotate(first_id=Min('id'), count=Count('id')).filter(count__gt=1))
+        duplicate_ids = []
+        for duplicate in duplicates:
+            duplicate_ids += (model.objects.filter(user=duplicate['user'], gather_room=duplicate['gather_room'])
+                              .exclude(id=duplicate['first_id']).order_by('id').values_list('id', flat=True))
+        return duplicate_ids
+    def recount_participants(self, gather_room_ids):
+        # The deleted reservations each held a seat, the rooms are counted again from what is left
+        reservation_count = (UserGatherRoomReservation.objects.filter(gather_room=OuterRef('pk'))
+                             .values('gather_room').annotate(count=Count('id')).values('count'))
+        GatherRoom.objects.filter(id__in=gather_room_ids).update(participants_count=Coalesce(Subquery(reservation_count), 0))
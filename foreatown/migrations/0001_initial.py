@@ -0,0 +1,147 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForeaTownBannerImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=100)),
+                ('img_url', models.URLField(null=True)),
+            ],
+            options={
+                'db_table': 'foreatown_banner_images',
+            },
+        ),
+        migrations.CreateModel(
+            name='ForeaTownPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=100)),
+                ('content', models.TextField(max_length=200)),
+                ('img_url', models.URLField(null=True)),
+            ],
+            options={
+                'db_table': 'foreatown_policies',
+            },
+        ),
+        migrations.CreateModel(
+            name='GatherRoom',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=100)),
+                ('content', models.TextField(max_length=200)),
+                ('address', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_online', models.BooleanField()),
+                ('avg_rating', models.FloatField(default=0.0)),
+                ('user_limit', models.PositiveSmallIntegerField(default=25)),
+                ('date_time', models.DateTimeField(null=True)),
+                ('creator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'gather_rooms',
+            },
+        ),
+        migrations.CreateModel(
+            name='GatherRoomCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'db_table': 'gather_room_categories',
+            },
+        ),
+        migrations.CreateModel(
+            name='Hashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'db_table': 'hashtags',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserGatherRoomReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gather_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_gather_room_reservations', to='foreatown.gatherroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_gather_room_reservations',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserGatherRoomLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gather_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='foreatown.gatherroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_gather_room_likes',
+            },
+        ),
+        migrations.CreateModel(
+            name='GatherRoomReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField(max_length=200)),
+                ('rating', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('gather_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gather_room_reviews', to='foreatown.gatherroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gather_room_reviews', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'gather_room_reviews',
+            },
+        ),
+        migrations.CreateModel(
+            name='GatherRoomImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('img_url', models.URLField(null=True)),
+                ('gather_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gather_room_images', to='foreatown.gatherroom')),
+            ],
+            options={
+                'db_table': 'gather_room_images',
+            },
+        ),
+        migrations.CreateModel(
+            name='GatherRoomHashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gather_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='foreatown.gatherroom')),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='foreatown.hashtag')),
+            ],
+            options={
+                'db_table': 'gather_room_hashtags',
+            },
+        ),
+        migrations.AddField(
+            model_name='gatherroom',
+            name='gather_room_category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='foreatown.gatherroomcategory'),
+        ),
+        migrations.AddField(
+            model_name='gatherroom',
+            name='participants',
+            field=models.ManyToManyField(related_name='participating_gather_rooms', through='foreatown.UserGatherRoomReservation', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
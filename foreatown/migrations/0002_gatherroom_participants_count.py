@@ -0,0 +1,29 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:24
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_participants_count(apps, schema_editor):
+    GatherRoom = apps.get_model('foreatown', 'GatherRoom')
+    UserGatherRoomReservation = apps.get_model('foreatown', 'UserGatherRoomReservation')
+    reservation_count = (UserGatherRoomReservation.objects.filter(gather_room=OuterRef('pk'))
+                         .values('gather_room').annotate(count=Count('id')).values('count'))
+    GatherRoom.objects.update(participants_count=Coalesce(Subquery(reservation_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatherroom',
+            name='participants_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_participants_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_no_duplicate_user_gather_rooms(apps, schema_editor):
+    # The unique constraints below can not be created over duplicate rows. They are not deleted here,
+    # `manage.py remove_duplicate_user_gather_rooms` removes them once someone has reviewed them
+    duplicate_counts = {}
+    for model_name in ['UserGatherRoomReservation', 'GatherRoomReview', 'UserGatherRoomLike']:
+        model = apps.get_model('foreatown', model_name)
+        count = (model.objects.values('user', 'gather_room')
+                 .annotate(count=Count('id')).filter(count__gt=1).count())
+        if count:
+           duplicate_counts[model_name] = count
+    if duplicate_counts:
+       raise RuntimeError(
+           'Duplicate (user, gather_room) rows block the unique constraints: '
+           + ', '.join(f'{model_name} {count}' for model_name, count in duplicate_counts.items())
+           + '. List them with `python manage.py remove_duplicate_user_gather_rooms --dry-run`, '
+           'remove them with `python manage.py remove_duplicate_user_gather_rooms` and run migrate again'
+       )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0002_gatherroom_participants_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicate_user_gather_rooms, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['gather_room_category', '-id'], name='gather_room_category_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['gather_room_category', 'date_time', 'id'], name='gather_room_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['creator', '-id'], name='gather_room_creator_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['date_time', 'id'], name='gather_room_date_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='gatherroomreview',
+            constraint=models.UniqueConstraint(fields=('user', 'gather_room'), name='unique_gather_room_review'),
+        ),
+        migrations.AddConstraint(
+            model_name='usergatherroomlike',
+            constraint=models.UniqueConstraint(fields=('user', 'gather_room'), name='unique_gather_room_like'),
+        ),
+        migrations.AddConstraint(
+            model_name='usergatherroomreservation',
+            constraint=models.UniqueConstraint(fields=('user', 'gather_room'), name='unique_gather_room_reservation'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0003_gather_room_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatherroomimage',
+            name='medium_img_url',
+            field=models.URLField(null=True),
+        ),
+        migrations.AddField(
+            model_name='gatherroomimage',
+            name='thumbnail_img_url',
+            field=models.URLField(null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0004_gatherroomimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('gather_room_image', 'Gather room image'), ('user_profile', 'User profile image')], max_length=20)),
+                ('target_id', models.BigIntegerField()),
+                ('object_key', models.CharField(max_length=100)),
+                ('spool_path', models.CharField(max_length=255, null=True)),
+                ('content_type', models.CharField(max_length=100, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'image_upload_jobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='gatherroomimage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='imageuploadjob',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='image_upload_job_due_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:40
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_gather_room_ratings(apps, schema_editor):
+    GatherRoom = apps.get_model('foreatown', 'GatherRoom')
+    GatherRoomReview = apps.get_model('foreatown', 'GatherRoomReview')
+    gather_room_reviews = (GatherRoomReview.objects.filter(gather_room=OuterRef('pk'), deleted_at__isnull=True)
+                           .values('gather_room'))
+    GatherRoom.objects.update(
+        avg_rating=Coalesce(Subquery(gather_room_reviews.annotate(avg_rating=Avg('rating')).values('avg_rating')), 0.0),
+        rating_sum=Coalesce(Subquery(gather_room_reviews.annotate(rating_sum=Sum('rating')).values('rating_sum')), 0),
+        rating_count=Coalesce(Subquery(gather_room_reviews.annotate(rating_count=Count('id')).values('rating_count')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0005_image_upload_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatherroom',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gatherroom',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['avg_rating', 'id'], name='gather_room_avg_rating_idx'),
+        ),
+        migrations.RunPython(populate_gather_room_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+# FULLTEXT with the ngram parser so Korean text without spaces between words is searchable,
+# other databases fall back to the in-process index in foreatown.search
+def add_gather_room_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+       schema_editor.execute('ALTER TABLE gather_rooms ADD FULLTEXT INDEX gather_room_fulltext_idx (subject, content) WITH PARSER ngram')
+
+
+def remove_gather_room_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+       schema_editor.execute('ALTER TABLE gather_rooms DROP INDEX gather_room_fulltext_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0006_gather_room_ratings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gatherroomhashtag',
+            index=models.Index(fields=['hashtag', 'gather_room'], name='gather_room_hashtag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hashtag',
+            index=models.Index(fields=['name'], name='hashtag_name_idx'),
+        ),
+        migrations.RunPython(add_gather_room_fulltext_index, remove_gather_room_fulltext_index),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0007_gather_room_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatherroom',
+            name='geohash',
+            field=models.CharField(max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='gatherroom',
+            name='latitude',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='gatherroom',
+            name='longitude',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['geohash'], name='gather_room_geohash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['gather_room_category', 'geohash'], name='gather_room_cat_geohash_idx'),
+        ),
+    ]
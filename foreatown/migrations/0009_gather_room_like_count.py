@@ -0,0 +1,35 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def populate_like_count(apps, schema_editor):
+    GatherRoom = apps.get_model('foreatown', 'GatherRoom')
+    UserGatherRoomLike = apps.get_model('foreatown', 'UserGatherRoomLike')
+    like_count = (UserGatherRoomLike.objects.filter(gather_room=OuterRef('pk'))
+                  .values('gather_room').annotate(count=Count('id')).values('count'))
+    GatherRoom.objects.update(like_count=Coalesce(Subquery(like_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0008_gather_room_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatherroom',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='usergatherroomlike',
+            name='gather_room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_gather_room_likes', to='foreatown.gatherroom'),
+        ),
+        migrations.RunPython(populate_like_count, migrations.RunPython.noop),
+    ]
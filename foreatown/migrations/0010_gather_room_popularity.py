@@ -0,0 +1,47 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0009_gather_room_like_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatherroom',
+            name='popularity_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='usergatherroomlike',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='usergatherroomreservation',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['popularity_score', 'id'], name='gather_room_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['gather_room_category', 'popularity_score', 'id'], name='gather_room_cat_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usergatherroomlike',
+            index=models.Index(fields=['created_at'], name='like_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usergatherroomreservation',
+            index=models.Index(fields=['created_at'], name='reservation_created_at_idx'),
+        ),
+    ]
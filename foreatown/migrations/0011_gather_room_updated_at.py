@@ -0,0 +1,22 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foreatown', '0010_gather_room_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatherroom',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='gatherroom',
+            index=models.Index(fields=['gather_room_category', 'updated_at'], name='gather_room_cat_updated_idx'),
+        ),
+    ]
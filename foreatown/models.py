@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class ForeaTownBannerImage(models.Model):
     subject = models.CharField(max_length=100) 
@@ -28,20 +29,48 @@ class GatherRoom(models.Model):
     subject = models.CharField(max_length=100)
     content = models.TextField(max_length=200)
     address = models.CharField(max_length=100, null=True, blank=True) 
+    latitude = models.FloatField(null=True)
+    longitude = models.FloatField(null=True)
+    geohash = models.CharField(max_length=12, null=True)
     is_online = models.BooleanField()
     avg_rating = models.FloatField(default=0.0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
     user_limit = models.PositiveSmallIntegerField(default=25)
+    participants_count = models.PositiveSmallIntegerField(default=0)
+    like_count = models.PositiveIntegerField(default=0)
+    popularity_score = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
     date_time = models.DateTimeField(null=True)
     creator = models.ForeignKey('users.User', on_delete = models.CASCADE)
     participants = models.ManyToManyField('users.User', related_name='participating_gather_rooms', through='foreatown.UserGatherRoomReservation')
     gather_room_category = models.ForeignKey(GatherRoomCategory, on_delete=models.CASCADE)
     class Meta:
         db_table = 'gather_rooms'
+        indexes = [
+            models.Index(fields=['gather_room_category', '-id'], name='gather_room_category_id_idx'),
+            models.Index(fields=['gather_room_category', 'date_time', 'id'], name='gather_room_category_date_idx'),
+            models.Index(fields=['creator', '-id'], name='gather_room_creator_id_idx'),
+            models.Index(fields=['date_time', 'id'], name='gather_room_date_time_idx'),
+            models.Index(fields=['avg_rating', 'id'], name='gather_room_avg_rating_idx'),
+            models.Index(fields=['geohash'], name='gather_room_geohash_idx'),
+            models.Index(fields=['gather_room_category', 'geohash'], name='gather_room_cat_geohash_idx'),
+            models.Index(fields=['popularity_score', 'id'], name='gather_room_popularity_idx'),
+            models.Index(fields=['gather_room_category', 'popularity_score', 'id'], name='gather_room_cat_popularity_idx'),
+            models.Index(fields=['gather_room_category', 'updated_at'], name='gather_room_cat_updated_idx'),
+        ]
     def __str__(self):
         return self.subject
 
 class GatherRoomImage(models.Model):
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (READY, 'Ready'), (FAILED, 'Failed')]
     img_url = models.URLField(max_length=200, null=True)
+    medium_img_url = models.URLField(max_length=200, null=True)
+    thumbnail_img_url = models.URLField(max_length=200, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=READY)
     gather_room = models.ForeignKey(GatherRoom, related_name='gather_room_images', on_delete=models.CASCADE)
     class Meta:
         db_table = 'gather_room_images'
@@ -57,6 +86,9 @@ class GatherRoomReview(models.Model):
     deleted_at = models.DateTimeField(null=True)
     class Meta:
         db_table = 'gather_room_reviews'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'gather_room'], name='unique_gather_room_review'),
+        ]
     def __str__(self):
         return self.user.name + "님의 리뷰입니다"
 
@@ -64,6 +96,9 @@ class Hashtag(models.Model):
     name = models.CharField(max_length=100) 
     class Meta:
         db_table = 'hashtags'
+        indexes = [
+            models.Index(fields=['name'], name='hashtag_name_idx'),
+        ]
     def __str__(self):
         return 'hashtag : #' + self.name 
 
@@ -72,21 +107,66 @@ class GatherRoomHashtag(models.Model):
     hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE)
     class Meta:
         db_table = 'gather_room_hashtags'
+        indexes = [
+            models.Index(fields=['hashtag', 'gather_room'], name='gather_room_hashtag_idx'),
+        ]
     def __str__(self):
         return 'hashtag : #' + self.hashtag.name + ', gather_room: ' + self.gather_room.subject
 
 class UserGatherRoomReservation(models.Model):
     user = models.ForeignKey('users.User', on_delete=models.CASCADE)
     gather_room = models.ForeignKey(GatherRoom, related_name='user_gather_room_reservations', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         db_table = 'user_gather_room_reservations'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'gather_room'], name='unique_gather_room_reservation'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='reservation_created_at_idx'),
+        ]
     def __str__(self):
         return self.user.name + ' - reserved room: ' + self.gather_room.subject 
 
 class UserGatherRoomLike(models.Model):
     user = models.ForeignKey('users.User', on_delete=models.CASCADE)
-    gather_room = models.ForeignKey(GatherRoom, on_delete=models.CASCADE)
+    gather_room = models.ForeignKey(GatherRoom, related_name='user_gather_room_likes', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         db_table = 'user_gather_room_likes'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'gather_room'], name='unique_gather_room_like'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='like_created_at_idx'),
+        ]
     def __str__(self):
         return self.user.name + ' - reserved room: ' + self.gather_room.subject 
+
+
+class ImageUploadJob(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed')]
+    GATHER_ROOM_IMAGE = 'gather_room_image'
+    USER_PROFILE = 'user_profile'
+    TARGET_TYPE_CHOICES = [(GATHER_ROOM_IMAGE, 'Gather room image'), (USER_PROFILE, 'User profile image')]
+    target_type = models.CharField(max_length=20, choices=TARGET_TYPE_CHOICES)
+    target_id = models.BigIntegerField()
+    object_key = models.CharField(max_length=100)
+    spool_path = models.CharField(max_length=255, null=True)
+    content_type = models.CharField(max_length=100, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        db_table = 'image_upload_jobs'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='image_upload_job_due_idx'),
+        ]
+    def __str__(self):
+        return self.target_type + ' #' + str(self.target_id) + ' - ' + self.status
@@ -0,0 +1,103 @@
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from foreatown.models import GatherRoom
+import heapq, math, re, threading
+
+WORD_PATTERN = re.compile(r'\w+')
+
+def tokenize(text):
+    # Character bigrams of every word, the same tokens MySQL's ngram parser puts in the FULLTEXT index
+    tokens = []
+    for word in WORD_PATTERN.findall((text or '').lower()):
+        if len(word) < 2:
+           tokens.append(word)
+        tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+class GatherRoomSearchIndex:
+    # In-process inverted index over subject and content, used where the database has no
+    # FULLTEXT index (SQLite). Built lazily on the first search and kept in sync by signals,
+    # queryset.update() and bulk_create() bypass the signals and need a clear().
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+        post_save.connect(self.on_save, sender=GatherRoom, weak=False, dispatch_uid='gather_room_search_index')
+        post_delete.connect(self.on_delete, sender=GatherRoom, weak=False, dispatch_uid='gather_room_search_index')
+    def clear(self):
+        with self.lock:
+            self.postings = defaultdict(dict)
+            self.document_terms = {}
+            self.built = False
+    def build(self):
+        gather_rooms = GatherRoom.objects.values_list('id', 'subject', 'content')
+        with self.lock:
+            for gather_room_id, subject, content in gather_rooms:
+                self.add_document(gather_room_id, subject, content)
+            self.built = True
+    def add_document(self, gather_room_id, subject, content):
+        self.remove_document(gather_room_id)
+        term_frequency = Counter(tokenize(subject) + tokenize(content))
+        for term, frequency in term_frequency.items():
+            self.postings[term][gather_room_id] = frequency
+        self.document_terms[gather_room_id] = term_frequency
+    def remove_document(self, gather_room_id):
+        for term in self.document_terms.pop(gather_room_id, {}):
+            self.postings[term].pop(gather_room_id, None)
+            if not self.postings[term]:
+               del self.postings[term]
+    def on_save(self, instance, **kwargs):
+        if self.built:
+           with self.lock:
+               self.add_document(instance.id, instance.subject, instance.content)
+    def on_delete(self, instance, **kwargs):
+        if self.built:
+           with self.lock:
+               self.remove_document(instance.id)
+    def search(self, text):
+        # {gather_room_id: score} of the rooms holding every query token, scored by term
+        # frequency times inverse document frequency
+        if not self.built:
+           self.build()
+        terms = set(tokenize(text))
+        with self.lock:
+            document_count = len(self.document_terms)
+            term_postings = [self.postings.get(term, {}) for term in terms]
+            if not term_postings:
+               return {}
+            matched_ids = set.intersection(*[set(postings) for postings in term_postings])
+            return {
+                gather_room_id: sum(postings[gather_room_id] * math.log(1 + document_count / len(postings)) for postings in term_postings)
+                for gather_room_id in matched_ids
+            }
+
+gather_room_search_index = GatherRoomSearchIndex()
+
+def search_gather_rooms(queryset, text):
+    # Annotates relevance and orders by it, the ordering ends on id for cursor pagination
+    if connection.vendor == 'mysql':
+       # Every word is a required phrase, otherwise a single shared bigram would be a match
+       boolean_query = ' '.join(f'+"{word}"' for word in WORD_PATTERN.findall(text))
+       relevance = RawSQL(
+           'MATCH (gather_rooms.subject, gather_rooms.content) AGAINST (%s IN BOOLEAN MODE)',
+           [boolean_query],
+           output_field=FloatField()
+       )
+       return queryset.annotate(relevance=relevance).filter(relevance__gt=0).order_by('-relevance', '-id')
+    scores = gather_room_search_index.search(text)
+    if not scores:
+       return queryset.none()
+    # Only the best matches make it into the query, a common bigram would otherwise put one
+    # WHEN and one IN term per matching room into the statement
+    candidate_limit = getattr(settings, 'GATHER_ROOM_SEARCH_FALLBACK_LIMIT')
+    if len(scores) > candidate_limit:
+       scores = dict(heapq.nlargest(candidate_limit, scores.items(), key=lambda item: (item[1], item[0])))
+    relevance = Case(
+        *[When(id=gather_room_id, then=Value(score)) for gather_room_id, score in scores.items()],
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+    return queryset.filter(id__in=scores).annotate(relevance=relevance).order_by('-relevance', '-id')
@@ -2,24 +2,86 @@ from queue import Empty
 from rest_framework import serializers
 from foreatown.models import *
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, ExpressionWrapper, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
 from rest_framework import exceptions
 from drf_writable_nested.serializers import WritableNestedModelSerializer
 from users.serializers import CreatorSerializer, ParticipantSerializer
+from utils import NameLookupCache, bump_cache_version
+
+gather_room_category_cache = NameLookupCache(GatherRoomCategory)
+
+def gather_room_review_cache_namespace(gather_room_id):
+    return f'gather_room_reviews:{gather_room_id}'
+
+def invalidate_gather_room_review_cache(gather_room_id):
+    # Bumped after commit, a page cached before then would otherwise miss the new review
+    transaction.on_commit(lambda: bump_cache_version(gather_room_review_cache_namespace(gather_room_id)))
+
+def gather_room_list_cache_namespace(gather_room_category_id=None):
+    return f'gather_room_list:{gather_room_category_id or "all"}'
+
+def invalidate_gather_room_list_cache(*gather_room_category_ids):
+    # The uncategorized list shows every room, so it is bumped along with the categories
+    namespaces = {gather_room_list_cache_namespace(category_id) for category_id in gather_room_category_ids + (None,)}
+    transaction.on_commit(lambda: [bump_cache_version(namespace) for namespace in namespaces])
+
+# Popularity scores change without touching updated_at, cached popular pages follow this version instead
+GATHER_ROOM_POPULARITY_CACHE_NAMESPACE = 'gather_room_popularity'
+
+def invalidate_gather_room_popularity_cache():
+    transaction.on_commit(lambda: bump_cache_version(GATHER_ROOM_POPULARITY_CACHE_NAMESPACE))
+
+def invalidate_gather_room_list_cache_on_change(instance, **kwargs):
+    invalidate_gather_room_list_cache(instance.gather_room_category_id)
+
+post_save.connect(invalidate_gather_room_list_cache_on_change, sender=GatherRoom, dispatch_uid='gather_room_list_cache')
+post_delete.connect(invalidate_gather_room_list_cache_on_change, sender=GatherRoom, dispatch_uid='gather_room_list_cache')
+
+def gather_room_rating_update(rating, count):
+    # Update kwargs adding (count=1) or removing (count=-1) one rating from the running totals.
+    # avg_rating goes first because MySQL evaluates SET left to right with already updated values
+    rating_sum = F('rating_sum') + rating * count
+    rating_count = F('rating_count') + count
+    return {
+        'avg_rating': Case(
+            When(rating_count=-count, then=Value(0.0)),
+            default=ExpressionWrapper(Cast(rating_sum, FloatField()) / rating_count, output_field=FloatField())
+        ),
+        'rating_sum': rating_sum,
+        'rating_count': rating_count,
+        'updated_at': timezone.now()
+    }
+
+def liked_gather_room_ids(user, gather_rooms):
+    # One IN query for a whole page, serializers read the result from context['liked_gather_room_ids']
+    if not user.is_authenticated or not gather_rooms:
+       return set()
+    gather_room_ids = [gather_room.id for gather_room in gather_rooms]
+    return set(UserGatherRoomLike.objects.filter(user=user, gather_room_id__in=gather_room_ids).values_list('gather_room_id', flat=True))
 
 class GatherRoomReadSerializer(serializers.ModelSerializer):
-    participants_count = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
     class Meta:
         model = GatherRoom
-        fields = ['id', 'subject', 'address', 'is_online', 'user_limit', 'participants_count', 'date_time', 'gather_room_category'] 
-    def get_participants_count(self, obj): 
-        return UserGatherRoomReservation.objects.filter(gather_room=obj.id).count()
+        fields = ['id', 'subject', 'address', 'is_online', 'user_limit', 'participants_count', 'like_count', 'is_liked', 'date_time', 'gather_room_category'] 
+    def get_is_liked(self, obj):
+        return obj.id in self.context.get('liked_gather_room_ids', ())
+
+class GatherRoomNearbyReadSerializer(GatherRoomReadSerializer):
+    distance = serializers.FloatField(read_only=True)
+    class Meta(GatherRoomReadSerializer.Meta):
+        fields = GatherRoomReadSerializer.Meta.fields + ['latitude', 'longitude', 'distance']
 
 class GatherRoomCategoryRetrieveIdByNameSerializer(serializers.RelatedField):
     def to_representation(self, value):
         return value.name
     def to_internal_value(self, data):
         try :
-          return GatherRoomCategory.objects.get(name=data['name'])
+          return gather_room_category_cache.get(data['name'])
         except GatherRoomCategory.DoesNotExist:
           raise ValueError('Matching GatherRoomCategory does not exist') 
     def get_queryset(self, *args):
@@ -33,7 +95,22 @@ class GatherRoomCategoryRetrieveSerializer(serializers.ModelSerializer):
 class GatherRoomImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = GatherRoomImage
-        fields = ('img_url',)
+        fields = ('img_url', 'status')
+
+class GatherRoomImageReadSerializer(serializers.ModelSerializer):
+    img_url = serializers.SerializerMethodField()
+    original_img_url = serializers.SerializerMethodField()
+    class Meta:
+        model = GatherRoomImage
+        fields = ('img_url', 'thumbnail_img_url', 'original_img_url', 'status')
+    def get_img_url(self, obj):
+        if obj.status != GatherRoomImage.READY:
+           return None
+        return obj.medium_img_url or obj.img_url
+    def get_original_img_url(self, obj):
+        if obj.status != GatherRoomImage.READY:
+           return None
+        return obj.img_url
 
 class GatherRoomOnlineCreateSerializer(WritableNestedModelSerializer):
     gather_room_category = GatherRoomCategoryRetrieveIdByNameSerializer()
@@ -81,10 +158,13 @@ class GatherRoomRetrieveSerializer(serializers.ModelSerializer):
     creator = CreatorSerializer(read_only=True)
     participants = ParticipantSerializer(many=True, read_only=True)
     gather_room_category = GatherRoomCategoryRetrieveSerializer()
-    gather_room_images = GatherRoomImageSerializer(many=True, read_only=True) 
+    gather_room_images = GatherRoomImageReadSerializer(many=True, read_only=True) 
+    is_liked = serializers.SerializerMethodField()
     class Meta: 
         model = GatherRoom   
-        fields = ['id', 'subject', 'content', 'address', 'is_online', 'user_limit', 'date_time', 'creator', 'participants', 'gather_room_category', 'gather_room_images']
+        fields = ['id', 'subject', 'content', 'address', 'is_online', 'user_limit', 'like_count', 'is_liked', 'date_time', 'creator', 'participants', 'gather_room_category', 'gather_room_images']
+    def get_is_liked(self, obj):
+        return obj.id in self.context.get('liked_gather_room_ids', ())
 
 class GatherRoomOfflineUpdateSerializer(WritableNestedModelSerializer):
     gather_room_category = GatherRoomCategoryRetrieveIdByNameSerializer()
@@ -117,10 +197,90 @@ class GatherRoomReservationCreateSerializer(serializers.ModelSerializer):
         model = UserGatherRoomReservation
         fields = ['user', 'gather_room']
     def validate(self, data):
-        reservation_history = UserGatherRoomReservation.objects.filter(user=data['user'], gather_room=data['gather_room'])
+        reservation_history = UserGatherRoomReservation.objects.filter(user=data['user'], gather_room=data['gather_room']).exists()
         if reservation_history: 
            raise ValueError("User already made the reservation for this gather_room")
         return data
+    def create(self, validated_data):
+        try:
+           with transaction.atomic():
+               reserved = GatherRoom.objects.filter(id=validated_data['gather_room'].id, participants_count__lt=F('user_limit')).update(participants_count=F('participants_count') + 1, updated_at=timezone.now())
+               if not reserved:
+                  raise ValueError("Gather room has already reached its user limit")
+               invalidate_gather_room_list_cache(validated_data['gather_room'].gather_room_category_id)
+               return super().create(validated_data)
+        except IntegrityError:
+           raise ValueError("User already made the reservation for this gather_room")
+
+class GatherRoomReservationBulkSerializer(serializers.Serializer):
+    # Reserves or cancels several gather rooms in one transaction, every id gets its own result
+    gather_room_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=50)
+    def validate_gather_room_ids(self, gather_room_ids):
+        return list(dict.fromkeys(gather_room_ids))
+    def lock_gather_rooms(self, gather_room_ids):
+        # Rows are locked in id order so that overlapping batches can not deadlock
+        return GatherRoom.objects.select_for_update().filter(id__in=gather_room_ids).order_by('id').in_bulk()
+    def reserved_gather_room_ids(self, user, gather_room_ids):
+        return set(UserGatherRoomReservation.objects.filter(user=user, gather_room_id__in=gather_room_ids).values_list('gather_room_id', flat=True))
+    def create_reservations(self, user, gather_room_ids, results):
+        # One insert for the whole batch. If it conflicts with a reservation made in the meantime,
+        # every id is retried in its own savepoint so that only the conflicting ids fail
+        try:
+            with transaction.atomic():
+                UserGatherRoomReservation.objects.bulk_create([UserGatherRoomReservation(user=user, gather_room_id=gather_room_id) for gather_room_id in gather_room_ids])
+            return gather_room_ids
+        except IntegrityError:
+            created_ids = []
+            for gather_room_id in gather_room_ids:
+                try:
+                    with transaction.atomic():
+                        UserGatherRoomReservation.objects.create(user=user, gather_room_id=gather_room_id)
+                    created_ids.append(gather_room_id)
+                except IntegrityError:
+                    results[gather_room_id] = "User already made the reservation for this gather_room"
+            return created_ids
+    def reserve(self, user):
+        gather_room_ids = self.validated_data['gather_room_ids']
+        results = {}
+        with transaction.atomic():
+            gather_rooms = self.lock_gather_rooms(gather_room_ids)
+            reserved_ids = self.reserved_gather_room_ids(user, gather_rooms)
+            for gather_room_id in gather_room_ids:
+                gather_room = gather_rooms.get(gather_room_id)
+                if gather_room is None:
+                   results[gather_room_id] = "Gather room does not exist"
+                elif gather_room_id in reserved_ids:
+                   results[gather_room_id] = "User already made the reservation for this gather_room"
+                elif gather_room.participants_count >= gather_room.user_limit:
+                   results[gather_room_id] = "Gather room has already reached its user limit"
+                else:
+                   results[gather_room_id] = None
+            new_ids = self.create_reservations(user, [gather_room_id for gather_room_id, error in results.items() if error is None], results)
+            GatherRoom.objects.filter(id__in=new_ids).update(participants_count=F('participants_count') + 1, updated_at=timezone.now())
+            invalidate_gather_room_list_cache(*[gather_rooms[gather_room_id].gather_room_category_id for gather_room_id in new_ids])
+        return self.to_result_list(results, 'RESERVED')
+    def cancel(self, user):
+        gather_room_ids = self.validated_data['gather_room_ids']
+        with transaction.atomic():
+            gather_rooms = self.lock_gather_rooms(gather_room_ids)
+            # The reservation rows are locked as well, an overlapping single cancel waits for this
+            # transaction and then deletes nothing, so each seat is freed once
+            reservations = dict(UserGatherRoomReservation.objects.select_for_update().filter(user=user, gather_room_id__in=gather_rooms).order_by('id').values_list('id', 'gather_room_id'))
+            UserGatherRoomReservation.objects.filter(id__in=reservations).delete()
+            canceled_ids = set(reservations.values())
+            GatherRoom.objects.filter(id__in=canceled_ids, participants_count__gt=0).update(participants_count=F('participants_count') - 1, updated_at=timezone.now())
+            invalidate_gather_room_list_cache(*[gather_rooms[gather_room_id].gather_room_category_id for gather_room_id in canceled_ids])
+        results = {
+            gather_room_id: None if gather_room_id in canceled_ids else "Reservation does not exist"
+            for gather_room_id in gather_room_ids
+        }
+        return self.to_result_list(results, 'CANCELED')
+    def to_result_list(self, results, success_status):
+        return [
+            {'gather_room_id': gather_room_id, 'status': success_status} if error is None else
+            {'gather_room_id': gather_room_id, 'status': 'FAILED', 'ERROR_MESSAGE': error}
+            for gather_room_id, error in results.items()
+        ]
 
 class GatherRoomReservationReadSerializer(serializers.ModelSerializer):
     gather_room = GatherRoomReadSerializer()
@@ -133,12 +293,30 @@ class GatherRoomReviewCreateSerializer(serializers.ModelSerializer):
         model = GatherRoomReview 
         fields = ['content', 'rating', 'user', 'gather_room']
     def validate(self, data):
-        reservation_history = UserGatherRoomReservation.objects.filter(user=data['user'], gather_room=data['gather_room']) 
+        reservation_history = UserGatherRoomReservation.objects.filter(user=data['user'], gather_room=data['gather_room']).exists()
         if not reservation_history: 
            raise exceptions.ValidationError("Participants are only allowed to write a review")
-        review_history = GatherRoomReview.objects.filter(user=data['user'], gather_room=data['gather_room']) 
+        review_history = GatherRoomReview.objects.filter(user=data['user'], gather_room=data['gather_room']).exists()
         if review_history: 
            raise exceptions.ValidationError("User already posted a review") 
         if data['rating'] < 0 or data['rating'] > 5: 
            raise ValueError("Rating must be between 0 and 5")
-        return data 
\ No newline at end of file
+        return data
+    def create(self, validated_data):
+        try:
+           with transaction.atomic():
+               gather_room_review = super().create(validated_data)
+               GatherRoom.objects.filter(id=gather_room_review.gather_room_id).update(**gather_room_rating_update(gather_room_review.rating, 1))
+               invalidate_gather_room_review_cache(gather_room_review.gather_room_id)
+               # The update sends no post_save, list pages ordered or filtered by rating are dropped here
+               invalidate_gather_room_list_cache(gather_room_review.gather_room.gather_room_category_id)
+               return gather_room_review
+        except IntegrityError:
+           raise exceptions.ValidationError("User already posted a review")
+ 
+
+class GatherRoomReviewReadSerializer(serializers.ModelSerializer):
+    user = CreatorSerializer()
+    class Meta:
+        model = GatherRoomReview
+        fields = ['id', 'content', 'rating', 'created_at', 'user']
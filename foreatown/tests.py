@@ -1,3 +1,966 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
+import os, time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from moto import mock_s3
+from PIL import Image
+from rest_framework.test import APIClient
+from foreatown.image_jobs import claim_image_upload_jobs, enqueue_image_upload_jobs, uploaded_image
+from foreatown.models import GatherRoom, GatherRoomCategory, GatherRoomHashtag, GatherRoomImage, GatherRoomReview, Hashtag, ImageUploadJob, UserGatherRoomLike, UserGatherRoomReservation
+from foreatown.search import gather_room_search_index, tokenize
+from foreatown.serializers import GatherRoomReservationBulkSerializer, gather_room_category_cache
+from users.models import Country, User
+from utils import DatabaseHealthCheckMiddleware, GazetteerGeocoder, S3Client, build_image_variants, encode_geohash, get_s3_client, set_geocoder, set_s3_client
+from utils.geo import geohash_prefixes
 
-# Create your tests here.
+class GatherRoomTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = GatherRoomCategory.objects.create(name='MeetUp')
+        self.creator = User.objects.create_user('creator@foreatown.com', 'password', name='creator')
+        self.users = [User.objects.create_user(f'user{i}@foreatown.com', 'password', name=f'user{i}') for i in range(3)]
+    def create_gather_room(self, **kwargs):
+        fields = {
+            'subject': 'subject',
+            'content': 'content',
+            'is_online': True,
+            'creator': self.creator,
+            'gather_room_category': self.category,
+        }
+        fields.update(kwargs)
+        return GatherRoom.objects.create(**fields)
+    @contextmanager
+    def assertNumSelectQueries(self, num):
+        # Writes open savepoints for their atomic blocks, only count the reads
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        select_queries = [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(select_queries), num, '\n'.join(select_queries))
+
+class GatherRoomListTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gather_rooms = [self.create_gather_room(subject=f'room{i}') for i in range(5)]
+        for user in self.users:
+            UserGatherRoomReservation.objects.create(user=user, gather_room=self.gather_rooms[0])
+        UserGatherRoomReservation.objects.create(user=self.users[0], gather_room=self.gather_rooms[1])
+        call_command('rebuild_participants_counts', stdout=StringIO())
+    def test_list_participants_count_without_per_row_queries(self):
+        # The page rows are also the validators, there is no count over the table
+        with self.assertNumSelectQueries(1):
+            response = self.client.get('/foreatown/gather-room/list')
+        self.assertEqual(response.status_code, 200)
+        participants_count = {room['id']: room['participants_count'] for room in response.data['results']}
+        self.assertEqual(participants_count[self.gather_rooms[0].id], 3)
+        self.assertEqual(participants_count[self.gather_rooms[1].id], 1)
+        self.assertEqual(participants_count[self.gather_rooms[2].id], 0)
+    def test_my_list_participants_count(self):
+        with self.assertNumSelectQueries(1):
+            response = self.client.get(f'/foreatown/gather-room/mylist/{self.creator.id}')
+        self.assertEqual(len(response.data), 5)
+    def test_reservation_list_participants_count(self):
+        self.client.force_authenticate(self.users[0])
+        # The reservations with their rooms, then the page's likes in one IN query
+        with self.assertNumSelectQueries(2):
+            response = self.client.get('/foreatown/gather-room/reservation/list')
+        self.assertEqual(sorted(reservation['gather_room']['participants_count'] for reservation in response.data), [1, 3])
+
+class GatherRoomCursorPaginationTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.gather_rooms = [self.create_gather_room(subject=f'room{i}', date_time=now + timedelta(days=i % 4, hours=1)) for i in range(12)]
+    def scroll(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [room['id'] for room in response.data['results']]
+            url = response.data['next']
+        return ids
+    def test_latest_pages_do_not_repeat_rows_inserted_while_scrolling(self):
+        response = self.client.get('/foreatown/gather-room/list?order_by=latest&page_size=5')
+        first_page = [room['id'] for room in response.data['results']]
+        self.create_gather_room(subject='inserted while scrolling')
+        ids = first_page + self.scroll(response.data['next'])
+        self.assertEqual(ids, sorted((room.id for room in self.gather_rooms), reverse=True))
+    def test_upcoming_pages_are_keyed_on_date_time_and_id(self):
+        self.create_gather_room(subject='past event', date_time=timezone.now() - timedelta(days=1))
+        ids = self.scroll('/foreatown/gather-room/list?order_by=upcoming&page_size=5')
+        expected = sorted(self.gather_rooms, key=lambda room: (room.date_time, room.id))
+        self.assertEqual(ids, [room.id for room in expected])
+    def test_page_size_is_capped(self):
+        for i in range(50):
+            self.create_gather_room(subject=f'extra{i}')
+        response = self.client.get('/foreatown/gather-room/list?page_size=1000')
+        self.assertEqual(len(response.data['results']), 50)
+    def test_invalid_cursor(self):
+        response = self.client.get('/foreatown/gather-room/list?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+class GatherRoomRetrieveTest(GatherRoomTestCase):
+    def test_retrieve_runs_a_fixed_number_of_queries(self):
+        gather_room = self.create_gather_room()
+        for i, user in enumerate(self.users):
+            UserGatherRoomReservation.objects.create(user=user, gather_room=gather_room)
+            GatherRoomImage.objects.create(gather_room=gather_room, img_url=f'https://foreatown.com/{i}.png')
+        # validators, room with category, creator, participants, images
+        with self.assertNumSelectQueries(5):
+            response = self.client.get(f'/foreatown/gather-room/{gather_room.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['creator']['name'], 'creator')
+        self.assertEqual(response.data['gather_room_category']['name'], 'MeetUp')
+        self.assertEqual(sorted(participant['id'] for participant in response.data['participants']), sorted(user.id for user in self.users))
+        self.assertEqual(len(response.data['gather_room_images']), 3)
+
+class GatherRoomIndexTest(GatherRoomTestCase):
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertRegex(plan, r'(SEARCH|SCAN) .* USING (COVERING )?INDEX', plan)
+    def test_list_query_plans_use_an_index(self):
+        user, gather_room = self.users[0], self.create_gather_room()
+        querysets = [
+            GatherRoom.objects.filter(gather_room_category=self.category).order_by('-id'),
+            GatherRoom.objects.filter(gather_room_category=self.category, date_time__gte=timezone.now()).order_by('date_time', 'id'),
+            GatherRoom.objects.filter(date_time__gte=timezone.now()).order_by('date_time', 'id'),
+            GatherRoom.objects.filter(creator=self.creator),
+            UserGatherRoomReservation.objects.filter(user=user),
+            UserGatherRoomReservation.objects.filter(user=user, gather_room=gather_room),
+            GatherRoomReview.objects.filter(user=user, gather_room=gather_room),
+            UserGatherRoomLike.objects.filter(user=user, gather_room=gather_room),
+        ]
+        for queryset in querysets:
+            with self.subTest(query=str(queryset.query)):
+                self.assertUsesIndex(queryset)
+
+class GatherRoomReservationTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gather_room = self.create_gather_room(user_limit=2)
+    def reserve(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post('/foreatown/gather-room/reservation', {'gather_room_id': self.gather_room.id})
+    def test_reservation_updates_participants_count(self):
+        self.assertEqual(self.reserve(self.users[0]).status_code, 201)
+        self.gather_room.refresh_from_db()
+        self.assertEqual(self.gather_room.participants_count, 1)
+    def test_reservation_refused_when_user_limit_reached(self):
+        self.reserve(self.users[0])
+        self.reserve(self.users[1])
+        response = self.reserve(self.users[2])
+        self.assertEqual(response.status_code, 400)
+        self.gather_room.refresh_from_db()
+        self.assertEqual(self.gather_room.participants_count, 2)
+        self.assertFalse(UserGatherRoomReservation.objects.filter(user=self.users[2]).exists())
+    def test_duplicate_reservation_is_refused(self):
+        self.reserve(self.users[0])
+        response = self.reserve(self.users[0])
+        self.assertEqual(response.status_code, 400)
+        self.gather_room.refresh_from_db()
+        self.assertEqual(self.gather_room.participants_count, 1)
+    def test_cancellation_frees_a_seat(self):
+        self.reserve(self.users[0])
+        reservation = UserGatherRoomReservation.objects.get(user=self.users[0])
+        response = self.client.delete(f'/foreatown/gather-room/reservation/{reservation.id}')
+        self.assertEqual(response.status_code, 204)
+        self.gather_room.refresh_from_db()
+        self.assertEqual(self.gather_room.participants_count, 0)
+    def test_overlapping_cancellations_free_one_seat(self):
+        self.reserve(self.users[1])
+        self.reserve(self.users[0])
+        reservation = UserGatherRoomReservation.objects.get(user=self.users[0])
+        # Both cancels loaded the reservation before either deleted it
+        with mock.patch('foreatown.views.GatherRoomReservationAPI.get_object', return_value=reservation):
+            for _ in range(2):
+                self.assertEqual(self.client.delete(f'/foreatown/gather-room/reservation/{reservation.id}').status_code, 204)
+        self.gather_room.refresh_from_db()
+        self.assertEqual(self.gather_room.participants_count, 1)
+        self.assertEqual(UserGatherRoomReservation.objects.filter(gather_room=self.gather_room).count(), 1)
+    def test_rebuild_participants_counts_command(self):
+        UserGatherRoomReservation.objects.create(user=self.users[0], gather_room=self.gather_room)
+        GatherRoom.objects.filter(id=self.gather_room.id).update(participants_count=7)
+        call_command('rebuild_participants_counts', stdout=StringIO())
+        self.gather_room.refresh_from_db()
+        self.assertEqual(self.gather_room.participants_count, 1)
+
+class GatherRoomReservationBulkTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gather_rooms = [self.create_gather_room(user_limit=2) for _ in range(3)]
+        self.client.force_authenticate(self.users[0])
+    def test_bulk_reservation_reports_each_gather_room(self):
+        UserGatherRoomReservation.objects.create(user=self.users[0], gather_room=self.gather_rooms[1])
+        GatherRoom.objects.filter(id=self.gather_rooms[2].id).update(participants_count=2)
+        gather_room_ids = [gather_room.id for gather_room in self.gather_rooms] + [9999]
+        response = self.client.post('/foreatown/gather-room/reservation/bulk', {'gather_room_ids': gather_room_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data], ['RESERVED', 'FAILED', 'FAILED', 'FAILED'])
+        self.assertEqual(response.data[1]['ERROR_MESSAGE'], 'User already made the reservation for this gather_room')
+        self.assertEqual(response.data[2]['ERROR_MESSAGE'], 'Gather room has already reached its user limit')
+        self.assertEqual(response.data[3]['ERROR_MESSAGE'], 'Gather room does not exist')
+        self.assertEqual(UserGatherRoomReservation.objects.filter(user=self.users[0]).count(), 2)
+        self.assertEqual(list(GatherRoom.objects.order_by('id').values_list('participants_count', flat=True)), [1, 0, 2])
+    def test_bulk_reservation_runs_a_fixed_number_of_queries(self):
+        gather_room_ids = [gather_room.id for gather_room in self.gather_rooms]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/foreatown/gather-room/reservation/bulk', {'gather_room_ids': gather_room_ids}, format='json')
+        self.assertEqual([result['status'] for result in response.data], ['RESERVED'] * 3)
+        statements = [query['sql'].split()[0] for query in context.captured_queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(statements.count('INSERT'), 1)
+        self.assertEqual(statements.count('UPDATE'), 1)
+    def test_bulk_reservation_conflict_fails_only_that_gather_room(self):
+        # A reservation committed after the batch read it fails its own id, the others still go through
+        UserGatherRoomReservation.objects.create(user=self.users[0], gather_room=self.gather_rooms[1])
+        gather_room_ids = [gather_room.id for gather_room in self.gather_rooms[:2]]
+        with mock.patch('foreatown.serializers.GatherRoomReservationBulkSerializer.reserved_gather_room_ids', return_value=set()):
+            response = self.client.post('/foreatown/gather-room/reservation/bulk', {'gather_room_ids': gather_room_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data], ['RESERVED', 'FAILED'])
+        self.assertEqual(response.data[1]['ERROR_MESSAGE'], 'User already made the reservation for this gather_room')
+        self.assertEqual(list(GatherRoom.objects.order_by('id').values_list('participants_count', flat=True)), [1, 0, 0])
+    def test_bulk_cancellation(self):
+        for gather_room in self.gather_rooms[:2]:
+            self.client.post('/foreatown/gather-room/reservation', {'gather_room_id': gather_room.id})
+        gather_room_ids = [gather_room.id for gather_room in self.gather_rooms]
+        response = self.client.delete('/foreatown/gather-room/reservation/bulk', {'gather_room_ids': gather_room_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data], ['CANCELED', 'CANCELED', 'FAILED'])
+        self.assertFalse(UserGatherRoomReservation.objects.exists())
+        self.assertEqual(list(GatherRoom.objects.values_list('participants_count', flat=True)), [0, 0, 0])
+    def test_bulk_cancellation_skips_reservations_canceled_meanwhile(self):
+        for gather_room in self.gather_rooms[:2]:
+            self.client.post('/foreatown/gather-room/reservation', {'gather_room_id': gather_room.id})
+        reservation = UserGatherRoomReservation.objects.get(gather_room=self.gather_rooms[0])
+        lock_gather_rooms = GatherRoomReservationBulkSerializer.lock_gather_rooms
+        def lock_then_cancel(serializer, gather_room_ids):
+            # A single cancel of the first reservation lands right after the rooms are locked
+            gather_rooms = lock_gather_rooms(serializer, gather_room_ids)
+            self.client.delete(f'/foreatown/gather-room/reservation/{reservation.id}')
+            return gather_rooms
+        with mock.patch.object(GatherRoomReservationBulkSerializer, 'lock_gather_rooms', lock_then_cancel):
+            response = self.client.delete('/foreatown/gather-room/reservation/bulk', {'gather_room_ids': [gather_room.id for gather_room in self.gather_rooms[:2]]}, format='json')
+        self.assertEqual([result['status'] for result in response.data], ['FAILED', 'CANCELED'])
+        self.assertEqual(list(GatherRoom.objects.order_by('id').values_list('participants_count', flat=True)), [0, 0, 0])
+    def test_bulk_request_requires_gather_room_ids(self):
+        response = self.client.post('/foreatown/gather-room/reservation/bulk', {'gather_room_ids': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+class GatherRoomRatingTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gather_room = self.create_gather_room()
+        for user in self.users:
+            UserGatherRoomReservation.objects.create(user=user, gather_room=self.gather_room)
+    def review(self, user, rating):
+        self.client.force_authenticate(user)
+        return self.client.post('/foreatown/gather-room/review', {'gather_room_id': self.gather_room.id, 'content': 'content', 'rating': rating})
+    def test_reviews_update_running_rating(self):
+        self.assertEqual(self.review(self.users[0], 5).status_code, 201)
+        self.review(self.users[1], 2)
+        self.gather_room.refresh_from_db()
+        self.assertEqual((self.gather_room.rating_sum, self.gather_room.rating_count, self.gather_room.avg_rating), (7, 2, 3.5))
+    def test_soft_delete_removes_rating_once(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+        review = GatherRoomReview.objects.get(user=self.users[1])
+        self.assertEqual(self.client.delete(f'/foreatown/gather-room/review/{review.id}').status_code, 204)
+        self.assertEqual(self.client.delete(f'/foreatown/gather-room/review/{review.id}').status_code, 400)
+        self.gather_room.refresh_from_db()
+        self.assertEqual((self.gather_room.rating_sum, self.gather_room.rating_count, self.gather_room.avg_rating), (5, 1, 5.0))
+        self.client.force_authenticate(self.users[0])
+        self.client.delete(f'/foreatown/gather-room/review/{GatherRoomReview.objects.get(user=self.users[0]).id}')
+        self.gather_room.refresh_from_db()
+        self.assertEqual((self.gather_room.rating_sum, self.gather_room.rating_count, self.gather_room.avg_rating), (0, 0, 0.0))
+    def test_reviews_refresh_cached_rating_pages(self):
+        path = '/foreatown/gather-room/list'
+        self.assertEqual(self.client.get(path, {'min_rating': 4}).data['results'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review(self.users[0], 5)
+        self.client.logout()
+        self.assertEqual([room['id'] for room in self.client.get(path, {'min_rating': 4}).data['results']], [self.gather_room.id])
+        review = GatherRoomReview.objects.get()
+        self.client.force_authenticate(self.users[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/foreatown/gather-room/review/{review.id}')
+        self.client.logout()
+        self.assertEqual(self.client.get(path, {'min_rating': 4}).data['results'], [])
+    def test_rebuild_gather_room_ratings_command(self):
+        GatherRoomReview.objects.create(user=self.users[0], gather_room=self.gather_room, content='content', rating=4)
+        GatherRoomReview.objects.create(user=self.users[1], gather_room=self.gather_room, content='content', rating=1)
+        GatherRoomReview.objects.create(user=self.users[2], gather_room=self.gather_room, content='content', rating=5, deleted_at=timezone.now())
+        empty_gather_room = self.create_gather_room()
+        GatherRoom.objects.update(avg_rating=3.0, rating_sum=9, rating_count=3)
+        call_command('rebuild_gather_room_ratings', stdout=StringIO())
+        self.gather_room.refresh_from_db()
+        empty_gather_room.refresh_from_db()
+        self.assertEqual((self.gather_room.rating_sum, self.gather_room.rating_count, self.gather_room.avg_rating), (5, 2, 2.5))
+        self.assertEqual((empty_gather_room.rating_sum, empty_gather_room.rating_count, empty_gather_room.avg_rating), (0, 0, 0.0))
+    def test_list_ordered_and_filtered_by_rating(self):
+        rated_gather_room = self.create_gather_room()
+        GatherRoom.objects.filter(id=rated_gather_room.id).update(avg_rating=4.5)
+        GatherRoom.objects.filter(id=self.gather_room.id).update(avg_rating=3.0)
+        response = self.client.get('/foreatown/gather-room/list', {'order_by': 'rating'})
+        self.assertEqual([gather_room['id'] for gather_room in response.data['results']], [rated_gather_room.id, self.gather_room.id])
+        response = self.client.get('/foreatown/gather-room/list', {'min_rating': 4})
+        self.assertEqual([gather_room['id'] for gather_room in response.data['results']], [rated_gather_room.id])
+
+class GatherRoomReviewListTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.gather_room = self.create_gather_room()
+        for user in self.users:
+            UserGatherRoomReservation.objects.create(user=user, gather_room=self.gather_room)
+        self.reviews = [GatherRoomReview.objects.create(user=user, gather_room=self.gather_room, content='content', rating=4) for user in self.users[:2]]
+    def test_review_list_is_paginated_and_skips_deleted_reviews(self):
+        GatherRoomReview.objects.create(user=self.creator, gather_room=self.gather_room, content='content', rating=1, deleted_at=timezone.now())
+        GatherRoomReview.objects.create(user=self.users[2], gather_room=self.create_gather_room(), content='content', rating=1)
+        response = self.client.get(f'/foreatown/gather-room/review/list/{self.gather_room.id}', {'page_size': 1})
+        self.assertEqual([review['id'] for review in response.data['results']], [self.reviews[1].id])
+        self.assertEqual(response.data['results'][0]['user']['name'], self.users[1].name)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([review['id'] for review in response.data['results']], [self.reviews[0].id])
+        self.assertIsNone(response.data['next'])
+    def test_review_list_is_served_from_cache(self):
+        with self.assertNumSelectQueries(1):
+            self.client.get(f'/foreatown/gather-room/review/list/{self.gather_room.id}')
+        with self.assertNumSelectQueries(0):
+            response = self.client.get(f'/foreatown/gather-room/review/list/{self.gather_room.id}')
+        self.assertEqual(len(response.data['results']), 2)
+    def test_unrelated_query_params_share_cached_pages(self):
+        path = f'/foreatown/gather-room/review/list/{self.gather_room.id}'
+        self.client.get(path, {'page_size': 1})
+        with self.assertNumSelectQueries(0):
+            response = self.client.get(path, {'page_size': 1, 'utm_source': 'share'})
+        self.assertEqual([review['id'] for review in response.data['results']], [self.reviews[1].id])
+        self.assertIn('utm_source=share', response.data['next'])
+        response = self.client.get(path, {'page_size': 1})
+        self.assertNotIn('utm_source', response.data['next'])
+    def test_new_review_invalidates_cached_pages(self):
+        self.client.get(f'/foreatown/gather-room/review/list/{self.gather_room.id}')
+        self.client.force_authenticate(self.users[2])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/foreatown/gather-room/review', {'gather_room_id': self.gather_room.id, 'content': 'content', 'rating': 5})
+        response = self.client.get(f'/foreatown/gather-room/review/list/{self.gather_room.id}')
+        self.assertEqual(len(response.data['results']), 3)
+    def test_review_list_requires_gather_room(self):
+        self.assertEqual(self.client.get('/foreatown/gather-room/review/list').status_code, 400)
+        response = self.client.get('/foreatown/gather-room/review/list', {'gather_room_id': self.gather_room.id})
+        self.assertEqual(len(response.data['results']), 2)
+
+class GatherRoomSearchTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        gather_room_search_index.clear()
+        self.addCleanup(gather_room_search_index.clear)
+        self.coffee_gather_room = self.create_gather_room(subject='Coffee chat', content='coffee coffee and cake')
+        self.study_gather_room = self.create_gather_room(subject='Korean study', content='study with coffee')
+        self.hiking_gather_room = self.create_gather_room(subject='Hiking', content='Bukhansan trail')
+    def search(self, **params):
+        response = self.client.get('/foreatown/gather-room/search', params)
+        self.assertEqual(response.status_code, 200)
+        return [gather_room['id'] for gather_room in response.data['results']]
+    def test_tokenize_into_bigrams(self):
+        self.assertEqual(tokenize('Cafe 모임'), ['ca', 'af', 'fe', '모임'])
+    def test_search_ranks_by_relevance(self):
+        self.assertEqual(self.search(q='coffee'), [self.coffee_gather_room.id, self.study_gather_room.id])
+        self.assertEqual(self.search(q='trail'), [self.hiking_gather_room.id])
+        self.assertEqual(self.search(q='swimming'), [])
+    def test_search_index_follows_saves_and_deletes(self):
+        self.search(q='coffee')
+        self.hiking_gather_room.content = 'coffee after hiking'
+        self.hiking_gather_room.save()
+        self.coffee_gather_room.delete()
+        self.assertEqual(self.search(q='coffee'), [self.hiking_gather_room.id, self.study_gather_room.id])
+    def test_search_filters_by_hashtag_and_category(self):
+        hashtag = Hashtag.objects.create(name='cafe')
+        GatherRoomHashtag.objects.create(gather_room=self.study_gather_room, hashtag=hashtag)
+        self.assertEqual(self.search(q='coffee', hashtag='cafe'), [self.study_gather_room.id])
+        self.assertEqual(self.search(hashtag='cafe'), [self.study_gather_room.id])
+        other_category = GatherRoomCategory.objects.create(name='Dating')
+        self.assertEqual(self.search(q='coffee', gather_room_category_id=other_category.id), [])
+    @override_settings(GATHER_ROOM_SEARCH_FALLBACK_LIMIT=1)
+    def test_fallback_search_keeps_the_best_matches(self):
+        self.assertEqual(self.search(q='coffee'), [self.coffee_gather_room.id])
+    def test_search_results_are_paginated(self):
+        response = self.client.get('/foreatown/gather-room/search', {'q': 'coffee', 'page_size': 1})
+        self.assertEqual([gather_room['id'] for gather_room in response.data['results']], [self.coffee_gather_room.id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([gather_room['id'] for gather_room in response.data['results']], [self.study_gather_room.id])
+        self.assertIsNone(response.data['next'])
+
+class GatherRoomNearbyTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        set_geocoder(GazetteerGeocoder())
+        self.addCleanup(set_geocoder, None)
+        self.gangnam_gather_room = self.create_located_gather_room(37.4979, 127.0276)
+        self.hongdae_gather_room = self.create_located_gather_room(37.5563, 126.9236)
+        self.busan_gather_room = self.create_located_gather_room(35.1796, 129.0756)
+    def create_located_gather_room(self, latitude, longitude, **kwargs):
+        return self.create_gather_room(is_online=False, address='address', latitude=latitude, longitude=longitude, geohash=encode_geohash(latitude, longitude), **kwargs)
+    def nearby(self, **params):
+        response = self.client.get('/foreatown/gather-room/list', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(len(geohash_prefixes(37.5, 127.0, 5)), 9)
+    def test_nearby_rooms_ordered_by_distance(self):
+        results = self.nearby(latitude=37.5172, longitude=127.0473, radius=20)
+        self.assertEqual([gather_room['id'] for gather_room in results], [self.gangnam_gather_room.id, self.hongdae_gather_room.id])
+        self.assertAlmostEqual(results[0]['distance'], 2.8, delta=0.2)
+        self.assertAlmostEqual(results[1]['distance'], 11.7, delta=0.2)
+        results = self.nearby(latitude=37.5172, longitude=127.0473, radius=5)
+        self.assertEqual([gather_room['id'] for gather_room in results], [self.gangnam_gather_room.id])
+    def test_nearby_combined_with_category(self):
+        other_category = GatherRoomCategory.objects.create(name='Dating')
+        dating_gather_room = self.create_located_gather_room(37.5, 127.03, gather_room_category=other_category)
+        response = self.client.get(f'/foreatown/gather-room/list/{other_category.id}', {'latitude': 37.5172, 'longitude': 127.0473})
+        self.assertEqual([gather_room['id'] for gather_room in response.data['results']], [dating_gather_room.id])
+    def test_nearby_rejects_invalid_location(self):
+        response = self.client.get('/foreatown/gather-room/list', {'latitude': 137, 'longitude': 127})
+        self.assertEqual(response.status_code, 400)
+    def test_offline_room_is_geocoded_on_create(self):
+        self.client.force_authenticate(self.creator)
+        response = self.client.post('/foreatown/gather-room', {
+            'subject': 'subject',
+            'content': 'content',
+            'address': 'Teheran-ro, Gangnam-gu, Seoul',
+            'is_online': 'False',
+            'user_limit': '10',
+            'date_time': '2026-12-01 10:00:00',
+            'gather_room_category': 'MeetUp',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        gather_room = GatherRoom.objects.latest('id')
+        self.assertEqual((gather_room.latitude, gather_room.longitude), GazetteerGeocoder.places['gangnam'])
+        self.assertEqual(gather_room.geohash, encode_geohash(gather_room.latitude, gather_room.longitude))
+    def test_geocode_gather_rooms_command(self):
+        gather_room = self.create_gather_room(is_online=False, address='해운대구 우동')
+        call_command('geocode_gather_rooms', stdout=StringIO())
+        gather_room.refresh_from_db()
+        self.assertEqual((gather_room.latitude, gather_room.longitude), GazetteerGeocoder.places['해운대구'])
+
+class GatherRoomLikeTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gather_rooms = [self.create_gather_room() for _ in range(3)]
+    def like(self, user, gather_room):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/foreatown/gather-room/{gather_room.id}/like')
+    def test_like_and_unlike_are_idempotent(self):
+        self.assertEqual(self.like(self.users[0], self.gather_rooms[0]).data, {'gather_room_id': self.gather_rooms[0].id, 'is_liked': True, 'like_count': 1})
+        self.assertEqual(self.like(self.users[0], self.gather_rooms[0]).data['like_count'], 1)
+        self.assertEqual(self.like(self.users[1], self.gather_rooms[0]).data['like_count'], 2)
+        response = self.client.delete(f'/foreatown/gather-room/{self.gather_rooms[0].id}/like')
+        self.assertEqual(response.data, {'gather_room_id': self.gather_rooms[0].id, 'is_liked': False, 'like_count': 1})
+        response = self.client.delete(f'/foreatown/gather-room/{self.gather_rooms[0].id}/like')
+        self.assertEqual(response.data['like_count'], 1)
+        self.assertEqual(UserGatherRoomLike.objects.count(), 1)
+    def test_like_requires_existing_room(self):
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.post('/foreatown/gather-room/9999/like').status_code, 400)
+    def test_list_shows_like_state_with_one_query(self):
+        self.like(self.users[1], self.gather_rooms[0])
+        self.like(self.users[0], self.gather_rooms[2])
+        with self.assertNumSelectQueries(2):
+            response = self.client.get('/foreatown/gather-room/list', {'order_by': 'latest'})
+        self.assertEqual([(gather_room['is_liked'], gather_room['like_count']) for gather_room in response.data['results']], [(True, 1), (False, 0), (False, 1)])
+    def test_anonymous_list_skips_like_query(self):
+        self.like(self.users[0], self.gather_rooms[0])
+        self.client.force_authenticate(None)
+        with self.assertNumSelectQueries(1):
+            response = self.client.get('/foreatown/gather-room/list')
+        self.assertFalse(any(gather_room['is_liked'] for gather_room in response.data['results']))
+    def test_retrieve_and_reservation_list_show_like_state(self):
+        self.like(self.users[0], self.gather_rooms[1])
+        self.assertTrue(self.client.get(f'/foreatown/gather-room/{self.gather_rooms[1].id}').data['is_liked'])
+        UserGatherRoomReservation.objects.create(user=self.users[0], gather_room=self.gather_rooms[1])
+        response = self.client.get('/foreatown/gather-room/reservation/list')
+        self.assertTrue(response.data[0]['gather_room']['is_liked'])
+
+class GatherRoomPopularityTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gather_rooms = [self.create_gather_room() for _ in range(4)]
+    def compute_popularity(self):
+        call_command('compute_gather_room_popularity', stdout=StringIO())
+        return dict(GatherRoom.objects.values_list('id', 'popularity_score'))
+    def test_recent_activity_outranks_old_activity(self):
+        for user in self.users:
+            UserGatherRoomReservation.objects.create(user=user, gather_room=self.gather_rooms[0])
+            UserGatherRoomReservation.objects.create(user=user, gather_room=self.gather_rooms[1])
+        UserGatherRoomReservation.objects.filter(gather_room=self.gather_rooms[0]).update(created_at=timezone.now() - timedelta(days=6))
+        UserGatherRoomLike.objects.create(user=self.users[0], gather_room=self.gather_rooms[2])
+        UserGatherRoomLike.objects.create(user=self.users[0], gather_room=self.gather_rooms[3])
+        UserGatherRoomLike.objects.filter(gather_room=self.gather_rooms[3]).update(created_at=timezone.now() - timedelta(days=30))
+        scores = self.compute_popularity()
+        self.assertGreater(scores[self.gather_rooms[1].id], scores[self.gather_rooms[0].id])
+        self.assertGreater(scores[self.gather_rooms[0].id], scores[self.gather_rooms[2].id])
+        self.assertGreater(scores[self.gather_rooms[2].id], 0)
+        self.assertEqual(scores[self.gather_rooms[3].id], 0)
+    def test_ratings_count_towards_popularity_and_stale_scores_reset(self):
+        GatherRoom.objects.filter(id=self.gather_rooms[0].id).update(avg_rating=4.0, rating_count=3, rating_sum=12)
+        GatherRoom.objects.filter(id=self.gather_rooms[1].id).update(popularity_score=50.0)
+        scores = self.compute_popularity()
+        self.assertGreater(scores[self.gather_rooms[0].id], 0)
+        self.assertEqual(scores[self.gather_rooms[1].id], 0)
+    def test_only_changed_scores_are_written_and_updated_at_is_kept(self):
+        UserGatherRoomLike.objects.create(user=self.users[0], gather_room=self.gather_rooms[0])
+        updated_at = GatherRoom.objects.get(id=self.gather_rooms[0].id).updated_at
+        out = StringIO()
+        call_command('compute_gather_room_popularity', stdout=out)
+        self.assertIn('updated 1', out.getvalue())
+        self.assertEqual(GatherRoom.objects.get(id=self.gather_rooms[0].id).updated_at, updated_at)
+        out = StringIO()
+        with CaptureQueriesContext(connection) as context:
+            call_command('compute_gather_room_popularity', stdout=out)
+        self.assertIn('updated 0', out.getvalue())
+        self.assertFalse([query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')])
+    def test_recompute_refreshes_cached_popular_pages(self):
+        response = self.client.get('/foreatown/gather-room/list', {'order_by': 'popular'})
+        self.assertEqual(response.data['results'][0]['id'], self.gather_rooms[3].id)
+        UserGatherRoomLike.objects.create(user=self.users[0], gather_room=self.gather_rooms[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.compute_popularity()
+        response = self.client.get('/foreatown/gather-room/list', {'order_by': 'popular'})
+        self.assertEqual(response.data['results'][0]['id'], self.gather_rooms[0].id)
+    def test_list_pages_through_popular_ordering(self):
+        for score, gather_room in zip([2.0, 9.0, 5.0, 0.0], self.gather_rooms):
+            GatherRoom.objects.filter(id=gather_room.id).update(popularity_score=score)
+        response = self.client.get('/foreatown/gather-room/list', {'order_by': 'popular', 'page_size': 2})
+        gather_room_ids = [gather_room['id'] for gather_room in response.data['results']]
+        response = self.client.get(response.data['next'])
+        gather_room_ids += [gather_room['id'] for gather_room in response.data['results']]
+        self.assertEqual(gather_room_ids, [self.gather_rooms[i].id for i in (1, 2, 0, 3)])
+
+class ConditionalGetTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gather_room = self.create_gather_room()
+    def revalidate(self, path, response, **headers):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+    def test_list_returns_304_until_a_room_changes(self):
+        response = self.client.get('/foreatown/gather-room/list')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        # Anonymous validators come from the list page cache
+        with self.assertNumSelectQueries(0):
+            not_modified = self.revalidate('/foreatown/gather-room/list', response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.client.force_authenticate(self.users[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/foreatown/gather-room/{self.gather_room.id}/like')
+        self.client.force_authenticate(None)
+        self.assertEqual(self.revalidate('/foreatown/gather-room/list', response).status_code, 200)
+    def test_list_etag_follows_the_page_rows(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get('/foreatown/gather-room/list')
+        self.assertEqual(self.revalidate('/foreatown/gather-room/list', response).status_code, 304)
+        GatherRoom.objects.filter(id=self.gather_room.id).update(updated_at=timezone.now() + timedelta(seconds=5))
+        self.assertEqual(self.revalidate('/foreatown/gather-room/list', response).status_code, 200)
+        response = self.client.get('/foreatown/gather-room/list')
+        self.create_gather_room()
+        self.assertEqual(self.revalidate('/foreatown/gather-room/list', response).status_code, 200)
+    def test_list_etag_differs_per_user_and_query(self):
+        anonymous_response = self.client.get('/foreatown/gather-room/list')
+        self.client.force_authenticate(self.users[0])
+        user_response = self.client.get('/foreatown/gather-room/list')
+        self.assertNotEqual(anonymous_response['ETag'], user_response['ETag'])
+        self.assertEqual(user_response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.revalidate('/foreatown/gather-room/list?order_by=latest', user_response).status_code, 200)
+    def test_retrieve_supports_etag_and_last_modified(self):
+        path = f'/foreatown/gather-room/{self.gather_room.id}'
+        response = self.client.get(path)
+        self.assertEqual(self.revalidate(path, response).status_code, 304)
+        self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        UserGatherRoomReservation.objects.create(user=self.users[0], gather_room=self.gather_room)
+        GatherRoom.objects.filter(id=self.gather_room.id).update(participants_count=1, updated_at=timezone.now() + timedelta(seconds=5))
+        self.assertEqual(self.revalidate(path, response).status_code, 200)
+    def test_retrieve_changes_with_participant_profile(self):
+        UserGatherRoomReservation.objects.create(user=self.users[0], gather_room=self.gather_room)
+        path = f'/foreatown/gather-room/{self.gather_room.id}'
+        response = self.client.get(path)
+        self.users[0].profile_img_url = 'https://foreatown.com/profile.png'
+        self.users[0].save()
+        self.assertEqual(self.revalidate(path, response).status_code, 200)
+    def test_user_info_and_country_list_revalidate(self):
+        path = f'/users/myinfo/{self.users[0].id}'
+        Country.objects.create(name='Korea')
+        self.users[0].country = Country.objects.get()
+        self.users[0].save()
+        response = self.client.get(path)
+        self.assertEqual(self.revalidate(path, response).status_code, 304)
+        self.users[0].nickname = 'nickname'
+        self.users[0].save()
+        self.assertEqual(self.revalidate(path, response).status_code, 200)
+        response = self.client.get('/users/country/list')
+        with self.assertNumSelectQueries(0):
+            self.assertEqual(self.revalidate('/users/country/list', response).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Country.objects.create(name='Japan')
+        self.assertEqual(self.revalidate('/users/country/list', response).status_code, 200)
+
+class GatherRoomListCacheTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_category = GatherRoomCategory.objects.create(name='Dating')
+        self.gather_room = self.create_gather_room(user_limit=5)
+        self.other_gather_room = self.create_gather_room(gather_room_category=self.other_category)
+    def list_ids(self, path='/foreatown/gather-room/list', **params):
+        return [gather_room['id'] for gather_room in self.client.get(path, params).data['results']]
+    def test_anonymous_pages_are_served_from_cache(self):
+        self.list_ids(order_by='latest')
+        with self.assertNumSelectQueries(0):
+            response = self.client.get('/foreatown/gather-room/list', {'order_by': 'latest'})
+        self.assertEqual([gather_room['id'] for gather_room in response.data['results']], [self.other_gather_room.id, self.gather_room.id])
+        self.assertEqual(self.client.get('/foreatown/gather-room/list', {'order_by': 'latest'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        with self.assertNumSelectQueries(1):
+            self.client.get('/foreatown/gather-room/list', {'order_by': 'latest', 'page_size': 1})
+    def test_authenticated_pages_are_not_cached(self):
+        self.client.force_authenticate(self.users[0])
+        self.list_ids()
+        with self.assertNumSelectQueries(2):
+            self.list_ids()
+    def test_room_changes_invalidate_their_category_and_the_full_list(self):
+        category_path = f'/foreatown/gather-room/list/{self.category.id}'
+        other_category_path = f'/foreatown/gather-room/list/{self.other_category.id}'
+        for path in ('/foreatown/gather-room/list', category_path, other_category_path):
+            self.list_ids(path)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_gather_room = self.create_gather_room()
+        self.assertIn(new_gather_room.id, self.list_ids())
+        self.assertIn(new_gather_room.id, self.list_ids(category_path))
+        with self.assertNumSelectQueries(0):
+            self.list_ids(other_category_path)
+    def test_reservation_invalidates_cached_counts(self):
+        self.list_ids()
+        self.client.force_authenticate(self.users[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/foreatown/gather-room/reservation', {'gather_room_id': self.gather_room.id})
+        self.client.force_authenticate(None)
+        response = self.client.get('/foreatown/gather-room/list')
+        participants_count = {gather_room['id']: gather_room['participants_count'] for gather_room in response.data['results']}
+        self.assertEqual(participants_count[self.gather_room.id], 1)
+
+class GatherRoomCategoryLookupCacheTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+    def test_lookup_is_served_from_cache(self):
+        with self.assertNumQueries(1):
+            gather_room_category_cache.get('MeetUp')
+        with self.assertNumQueries(0):
+            self.assertEqual(gather_room_category_cache.get('MeetUp'), self.category)
+    def test_save_invalidates_cached_lookup(self):
+        gather_room_category_cache.get('MeetUp')
+        self.category.name = 'Dating'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        with self.assertRaises(GatherRoomCategory.DoesNotExist):
+            gather_room_category_cache.get('MeetUp')
+        self.assertEqual(gather_room_category_cache.get('Dating'), self.category)
+    def test_delete_invalidates_cached_lookup(self):
+        gather_room_category_cache.get('MeetUp')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        with self.assertRaises(GatherRoomCategory.DoesNotExist):
+            gather_room_category_cache.get('MeetUp')
+
+class RequestTransactionPolicyTest(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gather_room = self.create_gather_room()
+    def test_read_runs_outside_a_transaction(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/foreatown/gather-room/list')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query['sql'] for query in context.captured_queries if 'SAVEPOINT' in query['sql']])
+    def test_write_runs_in_its_own_atomic_block(self):
+        self.client.force_authenticate(self.users[0])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(f'/foreatown/gather-room/{self.gather_room.id}/like')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('SAVEPOINT' in query['sql'] for query in context.captured_queries))
+    def test_benchmark_reports_both_policies(self):
+        out = StringIO()
+        call_command('benchmark_request_overhead', requests=2, path=['/foreatown/gather-room/list'], stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('per-request connection, ATOMIC_REQUESTS'))
+        self.assertTrue(lines[1].startswith('persistent connection, no request transaction'))
+
+class DatabaseHealthCheckMiddlewareTest(TransactionTestCase):
+    def tearDown(self):
+        connection.__dict__.pop('health_check_last_used', None)
+    def check_connection(self, is_usable, idle_seconds):
+        GatherRoomCategory.objects.exists()
+        connection.health_check_last_used = time.monotonic() - idle_seconds
+        middleware = DatabaseHealthCheckMiddleware(lambda request: None)
+        with mock.patch.dict(connection.settings_dict, CONN_HEALTH_CHECKS=True), \
+             mock.patch.object(connection, 'is_usable', return_value=is_usable) as ping, \
+             mock.patch.object(connection, 'close') as close:
+            middleware(RequestFactory().get('/'))
+        return ping.called, close.called
+    @override_settings(DATABASE_HEALTH_CHECK_IDLE_SECONDS=30)
+    def test_idle_unusable_connection_is_closed(self):
+        self.assertEqual(self.check_connection(False, 60), (True, True))
+    @override_settings(DATABASE_HEALTH_CHECK_IDLE_SECONDS=30)
+    def test_idle_usable_connection_is_kept(self):
+        self.assertEqual(self.check_connection(True, 60), (True, False))
+    @override_settings(DATABASE_HEALTH_CHECK_IDLE_SECONDS=30)
+    def test_recently_used_connection_is_not_pinged(self):
+        self.assertEqual(self.check_connection(False, 1), (False, False))
+
+@skipUnless(connection.vendor == 'sqlite', 'The replica is a second SQLite database')
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_READ_YOUR_WRITES_SECONDS=60)
+class ReplicaRouterTest(GatherRoomTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A second in-memory SQLite database stands in for the replica. It is created for this class
+        # only, after the runner has set up the configured databases, and removed again afterwards.
+        connections.settings['replica'] = {**connections.settings['default'], 'NAME': ':memory:', 'TEST': {**connections.settings['default']['TEST'], 'NAME': None}}
+        connections['replica'].creation.create_test_db(verbosity=0, autoclobber=True)
+        cls.databases = {'default', 'replica'}
+        try:
+            super().setUpClass()
+        except Exception:
+            cls.remove_replica()
+            raise
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.remove_replica()
+    @classmethod
+    def remove_replica(cls):
+        del cls.databases
+        connections['replica'].creation.destroy_test_db(':memory:', verbosity=0)
+        del connections['replica']
+        del connections.settings['replica']
+    def setUp(self):
+        super().setUp()
+        self.gather_room = self.create_gather_room(subject='primary')
+        # The replica lags behind the primary, it still has the room under its old subject
+        for instance in (self.category, self.creator, *self.users):
+            type(instance).objects.get(id=instance.id).save(using='replica', force_insert=True)
+        stale_gather_room = GatherRoom.objects.get(id=self.gather_room.id)
+        stale_gather_room.subject = 'replica'
+        stale_gather_room.save(using='replica', force_insert=True)
+    def test_list_and_retrieve_read_replica(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get('/foreatown/gather-room/list')
+        self.assertEqual([gather_room['subject'] for gather_room in response.data['results']], ['replica'])
+        response = self.client.get(f'/foreatown/gather-room/{self.gather_room.id}')
+        self.assertEqual(response.data['subject'], 'replica')
+    def test_cached_pages_are_filled_from_primary(self):
+        response = self.client.get('/foreatown/gather-room/list')
+        self.assertEqual([gather_room['subject'] for gather_room in response.data['results']], ['primary'])
+        GatherRoomReview.objects.create(user=self.users[0], gather_room=self.gather_room, content='primary', rating=5)
+        response = self.client.get(f'/foreatown/gather-room/review/list/{self.gather_room.id}')
+        self.assertEqual([review['content'] for review in response.data['results']], ['primary'])
+    def test_write_goes_to_primary_and_pins_writer(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post(f'/foreatown/gather-room/{self.gather_room.id}/like')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(UserGatherRoomLike.objects.using('default').filter(user=self.users[0]).exists())
+        self.assertFalse(UserGatherRoomLike.objects.using('replica').exists())
+        response = self.client.get(f'/foreatown/gather-room/{self.gather_room.id}')
+        self.assertEqual((response.data['subject'], response.data['is_liked']), ('primary', True))
+        self.client.force_authenticate(self.users[1])
+        response = self.client.get(f'/foreatown/gather-room/{self.gather_room.id}')
+        self.assertEqual(response.data['subject'], 'replica')
+    @override_settings(DATABASE_READ_YOUR_WRITES_SECONDS=0)
+    def test_pin_expires(self):
+        self.client.force_authenticate(self.users[0])
+        self.client.post(f'/foreatown/gather-room/{self.gather_room.id}/like')
+        response = self.client.get(f'/foreatown/gather-room/{self.gather_room.id}')
+        self.assertEqual(response.data['subject'], 'replica')
+
+@mock_s3
+class GatherRoomImageTestCase(GatherRoomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.s3_client = S3Client('testing', 'testing', 'foreatown-test')
+        self.s3_client.s3_client.create_bucket(Bucket='foreatown-test')
+        set_s3_client(self.s3_client)
+        spool_dir = TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        settings_override = override_settings(IMAGE_UPLOAD_SPOOL_DIR=spool_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+    def tearDown(self):
+        set_s3_client(None)
+    def image_file(self, size=(1600, 1200)):
+        buffer = BytesIO()
+        Image.new('RGBA', size, (255, 0, 0, 128)).save(buffer, format='PNG')
+        return SimpleUploadedFile('image.png', buffer.getvalue(), content_type='image/png')
+    def image_size(self, img_url):
+        return Image.open(BytesIO(self.s3_client.download(self.s3_client.object_key_from_url(img_url)))).size
+    def gather_room_form_data(self, **kwargs):
+        form_data = {
+            'subject': 'subject',
+            'content': 'content',
+            'address': '',
+            'is_online': 'True',
+            'user_limit': '10',
+            'date_time': '2026-12-01 10:00:00',
+            'gather_room_category': 'MeetUp',
+        }
+        form_data.update(kwargs)
+        return form_data
+    def process_image_upload_jobs(self):
+        call_command('process_image_upload_jobs', once=True, concurrency=1, stdout=StringIO())
+
+@mock_s3
+class S3ClientTest(GatherRoomImageTestCase):
+    def test_shared_client_is_created_once_and_lazily(self):
+        set_s3_client(None)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            s3_clients = list(executor.map(lambda _: get_s3_client(), range(16)))
+        self.assertEqual(len(set(map(id, s3_clients))), 1)
+        self.assertEqual(s3_clients[0].s3_client.meta.config.max_pool_connections, settings.AWS_S3_MAX_POOL_CONNECTIONS)
+    def test_presigned_upload_urls(self):
+        self.client.force_authenticate(self.creator)
+        response = self.client.post('/foreatown/gather-room/image/upload-url', {'count': 2, 'content_type': 'image/png'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['fields']['key'], response.data[0]['object_key'])
+        self.assertEqual(response.data[0]['fields']['Content-Type'], 'image/png')
+    def test_presigned_upload_rejects_non_images(self):
+        self.client.force_authenticate(self.creator)
+        response = self.client.post('/foreatown/gather-room/image/upload-url', {'content_type': 'text/html'})
+        self.assertEqual(response.status_code, 400)
+    def test_build_image_variants(self):
+        image_variants = build_image_variants(self.image_file((1600, 1200)).read())
+        self.assertEqual(Image.open(BytesIO(image_variants['thumbnail'])).size, (200, 150))
+        self.assertEqual(Image.open(BytesIO(image_variants['medium'])).size, (800, 600))
+
+@mock_s3
+class ImageUploadJobTest(GatherRoomImageTestCase):
+    def test_create_returns_pending_images_without_touching_s3(self):
+        self.client.force_authenticate(self.creator)
+        with mock.patch.object(self.s3_client.s3_client, 'upload_fileobj') as upload_fileobj:
+            response = self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_images=[self.image_file(), self.image_file()]), format='multipart')
+        self.assertEqual(response.status_code, 201)
+        upload_fileobj.assert_not_called()
+        self.assertEqual(list(GatherRoomImage.objects.values_list('status', flat=True)), [GatherRoomImage.PENDING] * 2)
+        job = ImageUploadJob.objects.first()
+        self.assertTrue(os.path.exists(job.spool_path))
+        response = self.client.get(f'/foreatown/gather-room/{GatherRoomImage.objects.first().gather_room_id}')
+        self.assertIsNone(response.data['gather_room_images'][0]['img_url'])
+    def test_worker_uploads_spooled_images_and_variants(self):
+        self.client.force_authenticate(self.creator)
+        self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_images=[self.image_file()]), format='multipart')
+        self.process_image_upload_jobs()
+        job = ImageUploadJob.objects.get()
+        self.assertEqual(job.status, ImageUploadJob.DONE)
+        self.assertFalse(os.path.exists(job.spool_path))
+        gather_room_image = GatherRoomImage.objects.get()
+        self.assertEqual(gather_room_image.status, GatherRoomImage.READY)
+        self.assertEqual(self.image_size(gather_room_image.img_url), (1600, 1200))
+        self.assertEqual(self.image_size(gather_room_image.medium_img_url), (800, 600))
+        self.assertEqual(self.image_size(gather_room_image.thumbnail_img_url), (200, 150))
+        response = self.client.get(f'/foreatown/gather-room/{gather_room_image.gather_room_id}')
+        self.assertEqual(response.data['gather_room_images'][0]['img_url'], gather_room_image.medium_img_url)
+        self.assertEqual(response.data['gather_room_images'][0]['original_img_url'], gather_room_image.img_url)
+    def issue_object_keys(self, user, count):
+        self.client.force_authenticate(user)
+        response = self.client.post('/foreatown/gather-room/image/upload-url', {'count': count, 'content_type': 'image/png'})
+        return [presigned_upload['object_key'] for presigned_upload in response.data]
+    def test_create_with_uploaded_object_keys(self):
+        object_keys = self.issue_object_keys(self.creator, 2)
+        for object_key in object_keys:
+            self.s3_client.upload_fileobj(self.image_file(), object_key, 'image/png')
+        missing_response = self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_image_keys=self.issue_object_keys(self.creator, 1)))
+        response = self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_image_keys=object_keys))
+        self.assertEqual(missing_response.status_code, 400)
+        self.assertEqual(response.status_code, 201)
+        self.process_image_upload_jobs()
+        gather_room = GatherRoom.objects.get()
+        self.assertEqual(sorted(image.img_url for image in gather_room.gather_room_images.all()), sorted(self.s3_client.object_url(object_key) for object_key in object_keys))
+        self.assertTrue(all(image.thumbnail_img_url for image in gather_room.gather_room_images.all()))
+    def test_object_keys_are_attached_once(self):
+        object_key = self.issue_object_keys(self.creator, 1)[0]
+        self.s3_client.upload_fileobj(self.image_file(), object_key, 'image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_image_keys=[object_key]))
+        reused_response = self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_image_keys=[object_key]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(reused_response.status_code, 400)
+        self.assertEqual(GatherRoom.objects.count(), 1)
+    def test_object_keys_issued_to_another_user_are_rejected(self):
+        object_key = self.issue_object_keys(self.users[0], 1)[0]
+        self.s3_client.upload_fileobj(self.image_file(), object_key, 'image/png')
+        self.client.force_authenticate(self.creator)
+        foreign_response = self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_image_keys=[object_key]))
+        unissued_object_key = self.s3_client.new_object_key()
+        self.s3_client.upload_fileobj(self.image_file(), unissued_object_key, 'image/png')
+        unissued_response = self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_image_keys=[unissued_object_key]))
+        self.assertEqual(foreign_response.status_code, 400)
+        self.assertEqual(unissued_response.status_code, 400)
+        self.assertFalse(GatherRoom.objects.exists())
+    def test_failed_jobs_are_retried_with_backoff(self):
+        self.client.force_authenticate(self.creator)
+        self.client.post('/foreatown/gather-room', self.gather_room_form_data(gather_room_images=[self.image_file()]), format='multipart')
+        with mock.patch.object(self.s3_client, 'upload_fileobj', side_effect=OSError('S3 is unavailable')), self.assertLogs('foreatown.image_jobs', 'ERROR'):
+            self.process_image_upload_jobs()
+            job = ImageUploadJob.objects.get()
+            self.assertEqual((job.status, job.attempts), (ImageUploadJob.PENDING, 1))
+            self.assertGreater(job.next_attempt_at, timezone.now() + timedelta(seconds=settings.IMAGE_UPLOAD_JOB_RETRY_DELAY - 5))
+            for attempt in range(2, settings.IMAGE_UPLOAD_JOB_MAX_ATTEMPTS + 1):
+                ImageUploadJob.objects.update(next_attempt_at=timezone.now())
+                self.process_image_upload_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ImageUploadJob.FAILED, settings.IMAGE_UPLOAD_JOB_MAX_ATTEMPTS))
+        self.assertEqual(GatherRoomImage.objects.get().status, GatherRoomImage.FAILED)
+        self.assertFalse(os.path.exists(job.spool_path))
+    def test_claimed_jobs_are_not_claimed_twice(self):
+        gather_room_image = GatherRoomImage.objects.create(gather_room=self.create_gather_room(), status=GatherRoomImage.PENDING)
+        enqueue_image_upload_jobs(ImageUploadJob.GATHER_ROOM_IMAGE, [(gather_room_image.id, uploaded_image(self.s3_client.new_object_key()))])
+        self.assertEqual(len(claim_image_upload_jobs(10)), 1)
+        self.assertEqual(claim_image_upload_jobs(10), [])
+
+class DuplicateUserGatherRoomMigrationTest(TransactionTestCase):
+    # Runs foreatown back to before the unique constraints, where duplicate rows could still be written
+    def setUp(self):
+        self.migrate_to([('foreatown', '0002_gatherroom_participants_count')])
+        self.addCleanup(lambda: self.migrate_to(MigrationExecutor(connection).loader.graph.leaf_nodes()))
+    def migrate_to(self, targets):
+        MigrationExecutor(connection).migrate(targets)
+    def create_duplicates(self):
+        old_apps = MigrationExecutor(connection).loader.project_state([('foreatown', '0002_gatherroom_participants_count')]).apps
+        User = old_apps.get_model('users', 'User')
+        GatherRoomCategory = old_apps.get_model('foreatown', 'GatherRoomCategory')
+        GatherRoom = old_apps.get_model('foreatown', 'GatherRoom')
+        user = User.objects.create(email='user@foreatown.com', name='user')
+        gather_room = GatherRoom.objects.create(subject='subject', content='content', is_online=True, creator=user, participants_count=2,
+                                                gather_room_category=GatherRoomCategory.objects.create(name='MeetUp'))
+        for model_name in ['UserGatherRoomReservation', 'UserGatherRoomLike']:
+            for _ in range(2):
+                old_apps.get_model('foreatown', model_name).objects.create(user=user, gather_room=gather_room)
+        return gather_room.id
+    def test_migration_refuses_duplicates_until_they_are_removed(self):
+        gather_room_id = self.create_duplicates()
+        with self.assertRaisesMessage(RuntimeError, 'UserGatherRoomReservation 1, UserGatherRoomLike 1'):
+            self.migrate_to([('foreatown', '0003_gather_room_indexes')])
+        call_command('remove_duplicate_user_gather_rooms', dry_run=True, stdout=StringIO())
+        self.assertEqual(UserGatherRoomReservation.objects.count(), 2)
+        call_command('remove_duplicate_user_gather_rooms', stdout=StringIO())
+        self.assertEqual(UserGatherRoomReservation.objects.count(), 1)
+        self.assertEqual(UserGatherRoomLike.objects.count(), 1)
+        self.assertEqual(GatherRoom.objects.filter(id=gather_room_id).values_list('participants_count', flat=True).get(), 1)
+        self.migrate_to([('foreatown', '0003_gather_room_indexes')])
@@ -1,15 +1,21 @@
 from django.urls import path, include
-from foreatown.views import GatherRoomAPI, GatherRoomReservationAPI, GatherRoomReviewAPI 
+from foreatown.views import GatherRoomAPI, GatherRoomLikeAPI, GatherRoomReservationAPI, GatherRoomReviewAPI 
 
 urlpatterns = [
     path("gather-room", GatherRoomAPI.as_view({"post": "create"}), name="post_gather_room"),
+    path("gather-room/image/upload-url", GatherRoomAPI.as_view({"post": "presigned_upload"}), name="post_gather_room_image_upload_url"),
     path("gather-room/<int:id>", GatherRoomAPI.as_view({"get": "retrieve", "patch": "partial_update", "delete": "destroy"}), name="create_update_delete_gather_room"),
+    path("gather-room/<int:id>/like", GatherRoomLikeAPI.as_view({"post": "create", "delete": "destroy"}), name="post_delete_gather_room_like"),
+    path("gather-room/search", GatherRoomAPI.as_view({"get": "search"}), name="get_gather_room_search"),
     path("gather-room/list", GatherRoomAPI.as_view({"get": "list"}), name="get_gather_room_list"),
     path("gather-room/list/<int:gather_room_category_id>", GatherRoomAPI.as_view({"get": "list"}), name="get_gather_room_list_by_category"), 
     path("gather-room/mylist/<int:user_id>", GatherRoomAPI.as_view({"get": "my_list"}), name="get_my_gather_room_list"),   
     path("gather-room/reservation", GatherRoomReservationAPI.as_view({"post": "create"}), name="post_gather_room_reservation"),
+    path("gather-room/reservation/bulk", GatherRoomReservationAPI.as_view({"post": "bulk_create", "delete": "bulk_destroy"}), name="post_delete_gather_room_reservation_bulk"),
     path("gather-room/reservation/list", GatherRoomReservationAPI.as_view({"get": "list"}), name="get_gather_room_reservation_list"),
     path("gather-room/reservation/<int:reservation_id>", GatherRoomReservationAPI.as_view({"delete": "destroy"}), name="delete_gather_room_reservation"),
     path("gather-room/review", GatherRoomReviewAPI.as_view({"post": "create"}), name="post_gather_room_review"), 
-    path("gather-room/review/list", GatherRoomReviewAPI.as_view({"get": "list"}), name="get_gather_room_review_list") 
+    path("gather-room/review/<int:review_id>", GatherRoomReviewAPI.as_view({"delete": "destroy"}), name="delete_gather_room_review"),
+    path("gather-room/review/list", GatherRoomReviewAPI.as_view({"get": "list"}), name="get_gather_room_review_list"),
+    path("gather-room/review/list/<int:gather_room_id>", GatherRoomReviewAPI.as_view({"get": "list"}), name="get_gather_room_review_list_by_gather_room") 
 ]
\ No newline at end of file
@@ -5,20 +5,27 @@ from rest_framework import status
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F, OuterRef, Prefetch, Subquery
 from django.conf import settings
+from django.utils import timezone
+from contextlib import nullcontext
 from datetime import datetime
-from utils import S3Client, GatherRoomListPagination
+from foreatown.image_jobs import enqueue_image_upload_jobs, spool_image_file, uploaded_image
+from foreatown.search import search_gather_rooms
+from utils import ConditionalGetMixin, PresignedUploadMixin, ReplicaReadMixin, GatherRoomCursorPagination, get_cache_version, get_s3_client, make_cache_key, primary_reads
+from utils import encode_geohash, geohash_prefix_filter, distance_km, geocode_address
 
-AWS_ACCESS_KEY_ID = getattr(settings, 'AWS_ACCESS_KEY_ID')
-AWS_SECRET_ACCESS_KEY = getattr(settings, 'AWS_SECRET_ACCESS_KEY')
-AWS_S3_BUCKET_NAME = getattr(settings, 'AWS_S3_BUCKET_NAME')
-
-class GatherRoomAPI(ModelViewSet):
+class GatherRoomAPI(ReplicaReadMixin, ConditionalGetMixin, PresignedUploadMixin, ModelViewSet):
     queryset = GatherRoom.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]    
-    pagination_class = GatherRoomListPagination
-    s3_client = S3Client(AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_S3_BUCKET_NAME)
+    pagination_class = GatherRoomCursorPagination
+    replica_read_actions = ('list', 'retrieve', 'my_list', 'search')
+    @property
+    def s3_client(self):
+        return get_s3_client()
     def get_object(self):
         queryset = self.get_queryset()
         if self.action == 'retrieve':
@@ -26,8 +33,21 @@ class GatherRoomAPI(ModelViewSet):
         if self.action == 'partial_update' or self.action == 'destroy': 
            return get_object_or_404(queryset, creator=self.request.user, id=self.kwargs.get('id'))
         return get_object_or_404(queryset, user=self.request.user)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+           queryset = queryset.select_related('gather_room_category').prefetch_related(
+               Prefetch('creator', queryset=User.objects.only('id', 'name', 'profile_img_url', 'profile_img_thumbnail_url')),
+               Prefetch('participants', queryset=User.objects.only('id', 'profile_img_url', 'profile_img_thumbnail_url')),
+               'gather_room_images'
+           )
+        return queryset
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['liked_gather_room_ids'] = getattr(self, 'liked_gather_room_ids', set())
+        return context
     def get_serializer_class(self):
-        if self.action == 'list' or self.action == 'my_list':
+        if self.action == 'list' or self.action == 'my_list' or self.action == 'search':
            return GatherRoomReadSerializer       
         if self.action == 'retrieve':
            return GatherRoomRetrieveSerializer
@@ -46,39 +66,128 @@ class GatherRoomAPI(ModelViewSet):
            gather_room_queryset = self.filter_queryset(self.get_queryset())
            gather_room_category = kwargs.get('gather_room_category_id') 
            if gather_room_category: 
-              gather_room_queryset = GatherRoom.objects.filter(gather_room_category=kwargs.get('gather_room_category_id'))
+              gather_room_queryset = gather_room_queryset.filter(gather_room_category=gather_room_category)
            gather_room_ordering_condition = request.query_params.get('order_by')
            if gather_room_ordering_condition == 'latest': 
               gather_room_queryset = gather_room_queryset.order_by('-id')
+           if gather_room_ordering_condition == 'upcoming': 
+              gather_room_queryset = gather_room_queryset.filter(date_time__gte=timezone.now()).order_by('date_time', 'id')
+           if gather_room_ordering_condition == 'rating': 
+              gather_room_queryset = gather_room_queryset.order_by('-avg_rating', '-id')
+           if gather_room_ordering_condition == 'popular': 
+              gather_room_queryset = gather_room_queryset.order_by('-popularity_score', '-id')
+           min_rating = request.query_params.get('min_rating')
+           if min_rating: 
+              gather_room_queryset = gather_room_queryset.filter(avg_rating__gte=float(min_rating))
+           serializer_class = self.get_serializer_class()
+           if 'latitude' in request.query_params and 'longitude' in request.query_params:
+              gather_room_queryset = self.filter_nearby(gather_room_queryset, request.query_params)
+              serializer_class = GatherRoomNearbyReadSerializer
+           # Anonymous pages are the same for everyone, nearby pages vary too much to be worth caching
+           cache_key = None
+           if not request.user.is_authenticated and serializer_class is GatherRoomReadSerializer:
+              popularity_version = get_cache_version(GATHER_ROOM_POPULARITY_CACHE_NAMESPACE) if gather_room_ordering_condition == 'popular' else None
+              cache_key = make_cache_key(
+                  gather_room_list_cache_namespace(gather_room_category),
+                  request.get_host(),
+                  popularity_version,
+                  *[request.query_params.get(param) for param in ('order_by', 'cursor', 'page_size', 'min_rating')]
+              )
+              cached_page = cache.get(cache_key)
+              if cached_page is not None:
+                 return self.conditional_response(request, cached_page['validators'], lambda: Response(cached_page['data']))
+           # The page rows are the validators, the cursor is part of the URL. Likes bump updated_at too,
+           # so a room added to, removed from or changed on this page changes the ETag.
+           # A page that goes into the cache is read from the primary.
+           with primary_reads() if cache_key is not None else nullcontext():
+               page = self.paginate_queryset(gather_room_queryset)
+               validators = [[gather_room.id for gather_room in page], max((gather_room.updated_at for gather_room in page), default=None), self.paginator.has_next]
+               response = self.conditional_response(
+                   request,
+                   validators,
+                   lambda: self.gather_room_page_response(request, page, serializer_class)
+               )
+           if cache_key is not None and response.status_code == 200:
+              cache.set(cache_key, {'validators': validators, 'data': response.data}, getattr(settings, 'GATHER_ROOM_LIST_CACHE_TIMEOUT'))
+           return response
+        except Exception as e:
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def gather_room_page_response(self, request, page, serializer_class):
+        self.liked_gather_room_ids = liked_gather_room_ids(request.user, page)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+    def search(self, request, *args, **kwargs):
+        try:
+           gather_room_queryset = self.get_queryset().order_by('-id')
+           gather_room_category = request.query_params.get('gather_room_category_id')
+           if gather_room_category:
+              gather_room_queryset = gather_room_queryset.filter(gather_room_category=gather_room_category)
+           hashtags = request.query_params.getlist('hashtag')
+           if hashtags:
+              gather_room_queryset = gather_room_queryset.filter(id__in=GatherRoomHashtag.objects.filter(hashtag__name__in=hashtags).values('gather_room_id'))
+           search_text = request.query_params.get('q', '').strip()
+           if search_text:
+              gather_room_queryset = search_gather_rooms(gather_room_queryset, search_text)
            page = self.paginate_queryset(gather_room_queryset)
-           if page is not None:
-              serializer = self.get_serializer(page, many=True)
-              return self.get_paginated_response(serializer.data)
-           serializer = self.get_serializer(gather_room_queryset, many=True)
-           return Response(serializer.data)
+           self.liked_gather_room_ids = liked_gather_room_ids(request.user, page)
+           serializer = self.get_serializer(page, many=True)
+           return self.get_paginated_response(serializer.data)
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def filter_nearby(self, gather_room_queryset, query_params):
+        # Nearest first within the radius in km, the geohash prefixes narrow the scan
+        # to the cells around the point before the exact distance is computed
+        latitude = float(query_params['latitude'])
+        longitude = float(query_params['longitude'])
+        radius = float(query_params.get('radius', getattr(settings, 'GATHER_ROOM_NEARBY_DEFAULT_RADIUS')))
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and radius > 0):
+           raise ValueError('Invalid location')
+        radius = min(radius, getattr(settings, 'GATHER_ROOM_NEARBY_MAX_RADIUS'))
+        return (gather_room_queryset
+                .filter(geohash_prefix_filter(latitude, longitude, radius))
+                .annotate(distance=distance_km(latitude, longitude))
+                .filter(distance__lte=radius)
+                .order_by('distance', 'id'))
     def my_list(self, request, *args, **kwargs):
         try: 
            gather_room_creator = kwargs.get('user_id')
-           gather_room_instance = GatherRoom.objects.filter(creator=gather_room_creator)
+           gather_room_instance = list(self.get_queryset().filter(creator=gather_room_creator))
+           self.liked_gather_room_ids = liked_gather_room_ids(request.user, gather_room_instance)
            serializer = self.get_serializer(gather_room_instance, many=True)
            return Response(serializer.data)
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
     def retrieve(self, request, *args, **kwargs):
         try:
-           gather_room_instance = self.get_object() 
-           serializer = self.get_serializer(gather_room_instance)
-           return Response(serializer.data)
+           gather_room_validators = get_object_or_404(
+               GatherRoom.objects.filter(id=self.kwargs.get('id'))
+               .annotate(participants_updated_at=Subquery(User.objects.filter(participating_gather_rooms=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1]))
+               .values_list('updated_at', 'creator__updated_at', 'participants_updated_at')
+           )
+           is_liked = request.user.is_authenticated and UserGatherRoomLike.objects.filter(user=request.user, gather_room_id=self.kwargs.get('id')).exists()
+           return self.conditional_response(
+               request,
+               [*gather_room_validators, is_liked],
+               lambda: self.gather_room_response(request),
+               last_modified=max(updated_at for updated_at in gather_room_validators if updated_at)
+           )
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def gather_room_response(self, request):
+        gather_room_instance = self.get_object() 
+        self.liked_gather_room_ids = liked_gather_room_ids(request.user, [gather_room_instance])
+        serializer = self.get_serializer(gather_room_instance)
+        return Response(serializer.data)
     def create(self, request, *args, **kwargs):
         try:
-            json_data = self.formdata_to_json(request)
-            serializer = self.get_serializer(data=json_data)
-            serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
+            image_uploads = self.retrieve_gather_room_image_upload_list(request)
+            json_data = self.formdata_to_json(request, image_uploads)
+            location = self.locate_gather_room(json_data)
+            with transaction.atomic():
+                serializer = self.get_serializer(data=json_data)
+                serializer.is_valid(raise_exception=True)
+                serializer.save(**location)
+                self.enqueue_gather_room_image_upload_jobs(serializer.instance, image_uploads)
             headers = self.get_success_headers(serializer.data)
             return Response({"SUCESSFULLY_CREATED"}, status=status.HTTP_201_CREATED, headers=headers)
         except Exception as e:
@@ -88,10 +197,16 @@ class GatherRoomAPI(ModelViewSet):
            kwargs['partial'] = True
            partial = kwargs.pop('partial', False)
            gather_room_instance = self.get_object()
-           json_data = self.formdata_to_json(request)
-           serializer = self.get_serializer(gather_room_instance, data=json_data, partial=partial)
-           serializer.is_valid(raise_exception=True)
-           self.perform_update(serializer)
+           previous_gather_room_category_id = gather_room_instance.gather_room_category_id
+           image_uploads = self.retrieve_gather_room_image_upload_list(request)
+           json_data = self.formdata_to_json(request, image_uploads)
+           location = self.locate_gather_room(json_data) if json_data['address'] != gather_room_instance.address else {}
+           with transaction.atomic():
+               serializer = self.get_serializer(gather_room_instance, data=json_data, partial=partial)
+               serializer.is_valid(raise_exception=True)
+               serializer.save(**location)
+               self.enqueue_gather_room_image_upload_jobs(serializer.instance, image_uploads)
+               invalidate_gather_room_list_cache(previous_gather_room_category_id)
            if getattr(gather_room_instance, '_prefetched_objects_cache', None):
                gather_room_instance._prefetched_objects_cache = {}
            return Response(serializer.data)
@@ -99,19 +214,33 @@ class GatherRoomAPI(ModelViewSet):
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
     def destroy(self, request, *args, **kwargs):
         try: 
-           instance = self.get_object()
-           self.perform_destroy(instance)
+           with transaction.atomic():
+               instance = self.get_object()
+               self.perform_destroy(instance)
            return Response({"SUCESSFULLY_DELETED"}, status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
-    def retrieve_gather_room_image_url_list(self, files, files_key):  
-        images_list = [] 
-        for image_file in files.getlist(files_key):
-            image_obj = {}
-            image_obj['img_url'] = self.s3_client.upload(image_file)
-            images_list.append(image_obj)
-        return images_list 
-    def formdata_to_json(self, request): 
+    def locate_gather_room(self, json_data):
+        # Geocoded before the transaction is opened, only offline rooms get a location
+        coordinates = None if json_data['is_online'] else geocode_address(json_data['address'])
+        if coordinates is None:
+           return {'latitude': None, 'longitude': None, 'geohash': None}
+        latitude, longitude = coordinates
+        return {'latitude': latitude, 'longitude': longitude, 'geohash': encode_geohash(latitude, longitude)}
+    def retrieve_gather_room_image_upload_list(self, request):
+        # Files are spooled to disk, object keys from presigned uploads must be the user's own and exist in S3
+        form_data = request.data
+        if 'gather_room_image_keys' in form_data:
+           object_keys = form_data.getlist('gather_room_image_keys') if hasattr(form_data, 'getlist') else form_data['gather_room_image_keys']
+           self.s3_client.uploaded_object_url_list(object_keys, request.user.id)
+           return [uploaded_image(object_key) for object_key in object_keys]
+        return [spool_image_file(image_file) for image_file in request.FILES.getlist('gather_room_images')]
+    def enqueue_gather_room_image_upload_jobs(self, gather_room_instance, image_uploads):
+        gather_room_image_id = {gather_room_image.img_url: gather_room_image.id for gather_room_image in gather_room_instance.gather_room_images.all()}
+        enqueue_image_upload_jobs(ImageUploadJob.GATHER_ROOM_IMAGE, [
+            (gather_room_image_id[self.s3_client.object_url(image_upload['object_key'])], image_upload) for image_upload in image_uploads
+        ])
+    def formdata_to_json(self, request, image_uploads): 
         form_data = request.data
         json_data = {
             'subject': form_data['subject'],
@@ -122,11 +251,13 @@ class GatherRoomAPI(ModelViewSet):
             'date_time': datetime.strptime(form_data['date_time'], '%Y-%m-%d %H:%M:%S'),
             'creator': request.user.id,
             'gather_room_category': {'name': form_data['gather_room_category']},
-            'gather_room_images': self.retrieve_gather_room_image_url_list(request.FILES, 'gather_room_images')  
+            'gather_room_images': [
+                {'img_url': self.s3_client.object_url(image_upload['object_key']), 'status': GatherRoomImage.PENDING} for image_upload in image_uploads
+            ]
         }
         return json_data
     
-class GatherRoomReservationAPI(ModelViewSet):
+class GatherRoomReservationAPI(ReplicaReadMixin, ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = UserGatherRoomReservation.objects.all()   
     def get_object(self): 
@@ -152,10 +283,27 @@ class GatherRoomReservationAPI(ModelViewSet):
            return Response({"SUCESSFULLY_CREATED"}, status=status.HTTP_201_CREATED, headers=headers)
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def bulk_create(self, request, *args, **kwargs):
+        try:
+           serializer = GatherRoomReservationBulkSerializer(data=request.data)
+           serializer.is_valid(raise_exception=True)
+           return Response(serializer.reserve(request.user), status=status.HTTP_200_OK)
+        except Exception as e:
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def bulk_destroy(self, request, *args, **kwargs):
+        try:
+           serializer = GatherRoomReservationBulkSerializer(data=request.data)
+           serializer.is_valid(raise_exception=True)
+           return Response(serializer.cancel(request.user), status=status.HTTP_200_OK)
+        except Exception as e:
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
     def list(self, request, *args, **kwargs):
         try: 
-           gather_room_reservation_instance = UserGatherRoomReservation.objects.filter(user=self.request.user)
-           serializer = self.get_serializer(gather_room_reservation_instance, many=True)
+           gather_room_reservation_instance = list(UserGatherRoomReservation.objects.filter(user=self.request.user).select_related('gather_room'))
+           gather_rooms = [gather_room_reservation.gather_room for gather_room_reservation in gather_room_reservation_instance]
+           context = self.get_serializer_context()
+           context['liked_gather_room_ids'] = liked_gather_room_ids(request.user, gather_rooms)
+           serializer = self.get_serializer_class()(gather_room_reservation_instance, many=True, context=context)
            return Response(serializer.data)
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
@@ -166,13 +314,74 @@ class GatherRoomReservationAPI(ModelViewSet):
            return Response({"SUCESSFULLY_DELETED"}, status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def perform_destroy(self, instance):
+        # Only the cancel that actually deleted the row frees the seat, an overlapping one is a no-op
+        with transaction.atomic():
+            deleted, _ = UserGatherRoomReservation.objects.filter(id=instance.id, user=self.request.user).delete()
+            if deleted:
+               GatherRoom.objects.filter(id=instance.gather_room_id, participants_count__gt=0).update(participants_count=F('participants_count') - 1, updated_at=timezone.now())
+               invalidate_gather_room_list_cache(instance.gather_room.gather_room_category_id)
+
+class GatherRoomLikeAPI(ModelViewSet):
+    # Liking twice or unliking a room that is not liked is a no-op, like_count moves only on a change
+    permission_classes = [IsAuthenticated]
+    queryset = UserGatherRoomLike.objects.all()
+    def create(self, request, *args, **kwargs):
+        try:
+           gather_room = get_object_or_404(GatherRoom.objects.only('id', 'gather_room_category_id'), id=kwargs.get('id'))
+           with transaction.atomic():
+               _, created = UserGatherRoomLike.objects.get_or_create(user=request.user, gather_room=gather_room)
+               if created:
+                  GatherRoom.objects.filter(id=gather_room.id).update(like_count=F('like_count') + 1, updated_at=timezone.now())
+                  invalidate_gather_room_list_cache(gather_room.gather_room_category_id)
+           return Response(self.like_state(gather_room.id, True), status=status.HTTP_200_OK)
+        except Exception as e:
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def destroy(self, request, *args, **kwargs):
+        try:
+           gather_room = get_object_or_404(GatherRoom.objects.only('id', 'gather_room_category_id'), id=kwargs.get('id'))
+           with transaction.atomic():
+               deleted, _ = UserGatherRoomLike.objects.filter(user=request.user, gather_room=gather_room).delete()
+               if deleted:
+                  GatherRoom.objects.filter(id=gather_room.id, like_count__gt=0).update(like_count=F('like_count') - 1, updated_at=timezone.now())
+                  invalidate_gather_room_list_cache(gather_room.gather_room_category_id)
+           return Response(self.like_state(gather_room.id, False), status=status.HTTP_200_OK)
+        except Exception as e:
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def like_state(self, gather_room_id, is_liked):
+        like_count = GatherRoom.objects.filter(id=gather_room_id).values_list('like_count', flat=True).get()
+        return {'gather_room_id': gather_room_id, 'is_liked': is_liked, 'like_count': like_count}
 
+# Every read here fills the review page cache, so it stays on the primary
 class GatherRoomReviewAPI(ModelViewSet):
     queryset = GatherRoomReview.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]    
+    pagination_class = GatherRoomCursorPagination
     def get_serializer_class(self):
         if self.action == 'create': 
            return GatherRoomReviewCreateSerializer
+        if self.action == 'list': 
+           return GatherRoomReviewReadSerializer
+    def list(self, request, *args, **kwargs):
+        try:
+           gather_room_id = int(kwargs.get('gather_room_id') or request.query_params['gather_room_id'])
+           # Pages are cached per decoded cursor and page size under the room's version, a new review bumps the version.
+           # Other query parameters can not split the cache, the next link is built for each request
+           paginator = self.paginator
+           cache_key = make_cache_key(gather_room_review_cache_namespace(gather_room_id), paginator.decode_cursor(request), paginator.get_page_size(request))
+           page_data = cache.get(cache_key)
+           if page_data is None:
+              gather_room_review_queryset = (GatherRoomReview.objects
+                                             .filter(gather_room_id=gather_room_id, deleted_at__isnull=True)
+                                             .select_related('user')
+                                             .order_by('-id'))
+              page = self.paginate_queryset(gather_room_review_queryset)
+              serializer = self.get_serializer(page, many=True)
+              page_data = {'results': serializer.data, 'next_cursor': paginator.get_next_cursor()}
+              cache.set(cache_key, page_data, getattr(settings, 'GATHER_ROOM_REVIEW_CACHE_TIMEOUT'))
+           return paginator.get_cursor_page_response(request, page_data['results'], page_data['next_cursor'])
+        except Exception as e:
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
     def create(self, request, *args, **kwargs): 
         try:
            json_data = {
@@ -187,4 +396,19 @@ class GatherRoomReviewAPI(ModelViewSet):
            headers = self.get_success_headers(serializer.data)
            return Response({"SUCESSFULLY_CREATED"}, status=status.HTTP_201_CREATED, headers=headers)
         except Exception as e:
-           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def destroy(self, request, *args, **kwargs):
+        try:
+           instance = get_object_or_404(self.get_queryset(), user=request.user, id=kwargs.get('review_id'), deleted_at__isnull=True)
+           self.perform_destroy(instance)
+           return Response({"SUCESSFULLY_DELETED"}, status=status.HTTP_204_NO_CONTENT)
+        except Exception as e:
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+    def perform_destroy(self, instance):
+        # Reviews are soft deleted, the filtered update makes a repeated delete leave the rating alone
+        with transaction.atomic():
+            deleted = GatherRoomReview.objects.filter(id=instance.id, deleted_at__isnull=True).update(deleted_at=timezone.now())
+            if deleted:
+               GatherRoom.objects.filter(id=instance.gather_room_id, rating_count__gt=0).update(**gather_room_rating_update(instance.rating, -1))
+               invalidate_gather_room_review_cache(instance.gather_room_id)
+               invalidate_gather_room_list_cache(instance.gather_room.gather_room_category_id)
@@ -1,7 +1,8 @@
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 from pathlib import Path
-import os, pymysql
+import os, pymysql, sys
 
 # Only for M1 laptop user 
 pymysql.install_as_MySQLdb()
@@ -15,6 +16,8 @@ SECRET_KEY = os.environ.get('SECRET_KEY')
 
 DEBUG = False 
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = ['*']
 
 SITE_ID = 12
@@ -23,11 +26,40 @@ SITE_ID = 12
 AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
 AWS_S3_BUCKET_NAME = os.environ.get('AWS_S3_BUCKET_NAME')
+AWS_S3_MULTIPART_CHUNKSIZE = int(os.environ.get('AWS_S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+AWS_S3_MAX_CONCURRENCY = int(os.environ.get('AWS_S3_MAX_CONCURRENCY', 4))
+AWS_S3_UPLOAD_WORKERS = int(os.environ.get('AWS_S3_UPLOAD_WORKERS', 8))
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_S3_MAX_POOL_CONNECTIONS', AWS_S3_UPLOAD_WORKERS * AWS_S3_MAX_CONCURRENCY))
+AWS_S3_MAX_ATTEMPTS = int(os.environ.get('AWS_S3_MAX_ATTEMPTS', 3))
+AWS_S3_PRESIGNED_EXPIRES_IN = 60 * 5
+AWS_S3_PRESIGNED_MAX_SIZE = 10 * 1024 * 1024
+AWS_S3_ISSUED_UPLOAD_TIMEOUT = 60 * 60
+
+# Resized image variants
+IMAGE_VARIANT_QUALITY = 80
+
+# Image upload queue, processed by `manage.py process_image_upload_jobs`
+# Uploaded files are spooled here by the web process and read by the worker, so this directory
+# must be on a volume both of them mount (the same host or a shared network volume)
+IMAGE_UPLOAD_SPOOL_DIR = os.environ.get('IMAGE_UPLOAD_SPOOL_DIR', str(BASE_DIR / 'upload_spool'))
+IMAGE_UPLOAD_JOB_MAX_ATTEMPTS = 5
+IMAGE_UPLOAD_JOB_RETRY_DELAY = 30
+IMAGE_UPLOAD_JOB_LEASE = 60 * 5
 
 # Kakao Login
 KAKAO_RESTAPI_KEY = os.environ.get('KAKAO_REST_API_KEY')
 KAKAO_CALLBACK_URI = os.environ.get('KAKAO_REDIRECT_URI')
 SERVICE_BASE_URL = os.environ.get('BASE_URL')
+KAKAO_AUTH_URL = os.environ.get('KAKAO_AUTH_URL', 'https://kauth.kakao.com')
+KAKAO_API_URL = os.environ.get('KAKAO_API_URL', 'https://kapi.kakao.com')
+KAKAO_OAUTH_TIMEOUT = 5
+KAKAO_OAUTH_POOL_SIZE = 10
+
+# Geocoding of offline gather room addresses, Kakao Local when a REST API key is configured
+GEOCODER_CLASS = os.environ.get('GEOCODER_CLASS', 'utils.geocoding.KakaoGeocoder' if KAKAO_RESTAPI_KEY else 'utils.geocoding.GazetteerGeocoder')
+GEOCODER_TIMEOUT = 3
+GATHER_ROOM_NEARBY_DEFAULT_RADIUS = 5
+GATHER_ROOM_NEARBY_MAX_RADIUS = 50
 
 # Application definition
 INSTALLED_APPS = [
@@ -61,6 +93,7 @@ INSTALLED_APPS = [
 
     # token
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
 
     # CORS Policy
     'corsheaders',
@@ -92,6 +125,8 @@ ACCOUNT_ADAPTER = 'users.adapters.CustomAccountAdapter'
 ROOT_URLCONF = 'myforeatown.urls'
 
 MIDDLEWARE = [
+    'utils.db.DatabaseHealthCheckMiddleware',
+    'utils.db.DatabaseRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -129,11 +164,61 @@ DATABASES = {
         'USER': os.environ.get('DB_USER'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT'),
-        'OPTIONS': {'charset': os.environ.get('DB_OPTION')},
-        'ATOMIC_REQUESTS': True
+        'OPTIONS': {'charset': os.environ.get('DB_OPTION')} if os.environ.get('DB_OPTION') else {},
+        # Connections are kept across requests and pinged before reuse by DatabaseHealthCheckMiddleware.
+        # Requests are not wrapped in a transaction, writes open their own atomic blocks.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() == 'true'
+    }
+}
+
+# Read replicas, one per comma separated entry of DB_REPLICAS (a host, or a file path with SQLite).
+# List and retrieve endpoints read from them unless the user wrote within DATABASE_READ_YOUR_WRITES_SECONDS.
+DATABASE_REPLICAS = []
+for replica_number, replica_location in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    replica_location_key = 'NAME' if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' else 'HOST'
+    DATABASES[f'replica_{replica_number}'] = {**DATABASES['default'], replica_location_key: replica_location.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{replica_number}')
+DATABASE_ROUTERS = ['utils.db.ReplicaRouter']
+# Persistent connections idle for longer than this are pinged before reuse
+DATABASE_HEALTH_CHECK_IDLE_SECONDS = 30
+DATABASE_READ_YOUR_WRITES_SECONDS = 5
+
+# Cache settings
+# Cache versions are bumped in one place and read by every worker, so the cache must be shared.
+# Production points CACHE_BACKEND at Redis (django.core.cache.backends.redis.RedisCache with
+# CACHE_LOCATION=redis://host:port), local memory is only used with DEBUG on or by the test runner
+if not os.environ.get('CACHE_BACKEND') and not (DEBUG or TESTING):
+   raise ImproperlyConfigured('CACHE_BACKEND must name a shared cache backend when DEBUG is off')
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Lifetime of cached GatherRoomCategory / Country lookups by name
+NAME_LOOKUP_CACHE_TIMEOUT = 60 * 60
+
+# Lifetime of a cached review page, posting or deleting a review drops the room's pages at once
+GATHER_ROOM_REVIEW_CACHE_TIMEOUT = 60 * 10
+
+# Lifetime of a cached anonymous gather room list page, room and reservation changes drop it sooner
+GATHER_ROOM_LIST_CACHE_TIMEOUT = 30
+
+# Best scored rooms the in-process search (databases without FULLTEXT) passes on to the query
+GATHER_ROOM_SEARCH_FALLBACK_LIMIT = 200
+
+# Popular ordering, recomputed by `manage.py compute_gather_room_popularity`.
+# Reservations and likes decay with the half-life and are ignored past the window
+GATHER_ROOM_POPULARITY_WINDOW_DAYS = 14
+GATHER_ROOM_POPULARITY_HALF_LIFE_DAYS = 3
+GATHER_ROOM_POPULARITY_WEIGHTS = {
+    'reservation': 3.0,
+    'like': 1.0,
+    'rating': 2.0,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -201,7 +286,7 @@ CORS_ALLOW_METHODS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ]
     # 'DEFAULT_FILTER_BACKENDS': [
     #     'django_filters.rest_framework.DjangoFilterBackend',
@@ -229,6 +314,8 @@ SIMPLE_JWT = {
 }
 
 REST_USE_JWT = True
+# Seconds a JWT-authenticated user row is served from the cache, capped at the access token lifetime
+JWT_USER_CACHE_TIMEOUT = 60
 
 # 엑셀 파일 데이터를 DB에 삽입시 발생하는 허용량 초과 범위를 늘려주는 명령어
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 30000 
\ No newline at end of file
@@ -4,6 +4,7 @@ from rest_framework_simplejwt.views import (
 )
 
 from django.contrib import admin
+from django.db import transaction
 from django.urls import path, include
 
 urlpatterns = [
@@ -12,7 +13,7 @@ urlpatterns = [
     path('foreatown/', include('foreatown.urls')),
     path('accounts/', include('allauth.urls')),
 
-    # simple JWT
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    # simple JWT, rotation blacklists the old refresh token and records the new one together
+    path('api/token/', transaction.atomic(TokenObtainPairView.as_view()), name='token_obtain_pair'),
+    path('api/token/refresh/', transaction.atomic(TokenRefreshView.as_view()), name='token_refresh'),
 ]
@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from users.models import User
+from utils import bump_cache_version, make_cache_key
+
+def user_cache_namespace(user_id):
+    return f'jwt_user:{user_id}'
+
+def invalidate_cached_user(*user_ids):
+    # Bumped after commit, a request authenticating in between would otherwise cache the old row again
+    namespaces = {user_cache_namespace(user_id) for user_id in user_ids}
+    transaction.on_commit(lambda: [bump_cache_version(namespace) for namespace in namespaces])
+
+def invalidate_cached_user_on_change(instance, **kwargs):
+    invalidate_cached_user(instance.id)
+
+def invalidate_cached_user_on_blacklist(instance, **kwargs):
+    # A blacklisted refresh token (logout or rotation) drops the user entry, so later requests reload the row
+    invalidate_cached_user(instance.token.user_id)
+
+post_save.connect(invalidate_cached_user_on_change, sender=User, dispatch_uid='jwt_user_cache')
+post_delete.connect(invalidate_cached_user_on_change, sender=User, dispatch_uid='jwt_user_cache')
+if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+   from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+   post_save.connect(invalidate_cached_user_on_blacklist, sender=BlacklistedToken, dispatch_uid='jwt_user_cache')
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # Resolves the token's user from the cache instead of loading users.User on every request.
+    # Entries are versioned per user and never outlive an access token.
+    @property
+    def cache_timeout(self):
+        return min(getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60), int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds()))
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        key = make_cache_key(user_cache_namespace(user_id))
+        user = cache.get(key)
+        if user is None:
+           try:
+               # Serializers read the country of the request user, it is cached along with the row.
+               # The password hash stays out of the shared cache, it is loaded on access if ever needed
+               user = User.objects.select_related('country').defer('password').get(**{jwt_settings.USER_ID_FIELD: user_id})
+           except User.DoesNotExist:
+               raise AuthenticationFailed(_('User not found'), code='user_not_found')
+           cache.set(key, user, self.cache_timeout)
+        if not user.is_active:
+           raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
@@ -0,0 +1,112 @@
+from allauth.socialaccount.providers.kakao.views import KakaoOAuth2Adapter
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio, httpx, requests, threading
+
+class KakaoOAuthError(ValueError):
+    pass
+
+class KakaoClient:
+    # Token exchange and profile fetch over one pooled session, only connection failures are retried
+    # since an authorization code can be redeemed once
+    def __init__(self, auth_url=None, api_url=None, rest_api_key=None, redirect_uri=None, timeout=None, pool_size=None):
+        self.auth_url = (auth_url or getattr(settings, 'KAKAO_AUTH_URL')).rstrip('/')
+        self.api_url = (api_url or getattr(settings, 'KAKAO_API_URL')).rstrip('/')
+        self.rest_api_key = rest_api_key or getattr(settings, 'KAKAO_RESTAPI_KEY')
+        self.redirect_uri = redirect_uri or getattr(settings, 'KAKAO_CALLBACK_URI')
+        self.timeout = timeout or getattr(settings, 'KAKAO_OAUTH_TIMEOUT', 5)
+        self.pool_size = pool_size or getattr(settings, 'KAKAO_OAUTH_POOL_SIZE', 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    @property
+    def profile_url(self):
+        return f'{self.api_url}/v2/user/me'
+    def token_request(self, code):
+        return f'{self.auth_url}/oauth/token', {
+            'grant_type': 'authorization_code',
+            'client_id': self.rest_api_key,
+            'redirect_uri': self.redirect_uri,
+            'code': code,
+        }
+    def profile_headers(self, access_token):
+        return {'Authorization': f'Bearer {access_token}'}
+    def fetch_access_token(self, code):
+        url, data = self.token_request(code)
+        return parse_token_response(self.session.post(url, data=data, timeout=self.timeout))
+    def fetch_profile(self, access_token):
+        return parse_profile_response(self.session.get(self.profile_url, headers=self.profile_headers(access_token), timeout=self.timeout))
+
+class AsyncKakaoClient:
+    # The same calls on httpx for ASGI deployments, one connection pool per event loop
+    def __init__(self, kakao_client):
+        self.kakao_client = kakao_client
+        self.http_clients = {}
+        self.lock = threading.Lock()
+    def http_client(self):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            http_client = self.http_clients.get(loop)
+            if http_client is None or http_client.is_closed:
+               # Clients of loops that have since closed can no longer be used
+               self.http_clients = {loop: client for loop, client in self.http_clients.items() if not loop.is_closed()}
+               http_client = httpx.AsyncClient(
+                   timeout=self.kakao_client.timeout,
+                   limits=httpx.Limits(max_connections=self.kakao_client.pool_size, max_keepalive_connections=self.kakao_client.pool_size),
+                   transport=httpx.AsyncHTTPTransport(retries=2)
+               )
+               self.http_clients[loop] = http_client
+        return http_client
+    async def fetch_access_token(self, code):
+        url, data = self.kakao_client.token_request(code)
+        return parse_token_response(await self.http_client().post(url, data=data))
+    async def fetch_profile(self, access_token):
+        return parse_profile_response(await self.http_client().get(self.kakao_client.profile_url, headers=self.kakao_client.profile_headers(access_token)))
+
+def parse_token_response(response):
+    token_json = response.json()
+    if token_json.get('error') or response.status_code != 200:
+       raise KakaoOAuthError(token_json.get('error_description') or token_json.get('error') or '카카오 토큰 발급에 실패했습니다')
+    return token_json['access_token']
+
+def parse_profile_response(response):
+    profile_json = response.json()
+    if profile_json.get('msg') or response.status_code != 200:
+       raise KakaoOAuthError(profile_json.get('msg') or '카카오 사용자 정보 조회에 실패했습니다')
+    return profile_json
+
+_kakao_client = None
+_async_kakao_client = None
+_kakao_client_lock = threading.Lock()
+
+def get_kakao_client():
+    global _kakao_client
+    if _kakao_client is None:
+       with _kakao_client_lock:
+           if _kakao_client is None:
+              _kakao_client = KakaoClient()
+    return _kakao_client
+
+def get_async_kakao_client():
+    global _async_kakao_client
+    kakao_client = get_kakao_client()
+    if _async_kakao_client is None or _async_kakao_client.kakao_client is not kakao_client:
+       with _kakao_client_lock:
+           if _async_kakao_client is None or _async_kakao_client.kakao_client is not kakao_client:
+              _async_kakao_client = AsyncKakaoClient(kakao_client)
+    return _async_kakao_client
+
+def set_kakao_client(kakao_client):
+    global _kakao_client
+    _kakao_client = kakao_client
+
+class PooledKakaoOAuth2Adapter(KakaoOAuth2Adapter):
+    # Reuses the profile kakao_login already fetched instead of asking Kakao a second time
+    @property
+    def profile_url(self):
+        return get_kakao_client().profile_url
+    def complete_login(self, request, app, token, **kwargs):
+        extra_data = getattr(request, 'kakao_profile', None) or get_kakao_client().fetch_profile(token.token)
+        return self.get_provider().sociallogin_from_response(request, extra_data)
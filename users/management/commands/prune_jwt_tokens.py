@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+import time
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWT refresh tokens in small batches'
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches')
+        parser.add_argument('--grace-minutes', type=int, default=60, help='Keep tokens that expired less than this long ago')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches, a later run picks up the rest')
+    def handle(self, *args, **options):
+        started_at = time.monotonic()
+        # Tokens still in the grace window may be blacklisted by an in-flight refresh
+        expired_before = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        outstanding_deleted, blacklisted_deleted, batch_count, last_id = 0, 0, 0, 0
+        while options['max_batches'] is None or batch_count < options['max_batches']:
+            # Walks the primary key so every batch is a short range scan, and each batch commits on
+            # its own so locks are held briefly and an interrupted run keeps what it deleted
+            token_ids = list(OutstandingToken.objects.filter(id__gt=last_id, expires_at__lt=expired_before)
+                             .order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not token_ids:
+               break
+            with transaction.atomic():
+                blacklisted_deleted += BlacklistedToken.objects.filter(token_id__in=token_ids).delete()[0]
+                outstanding_deleted += OutstandingToken.objects.filter(id__in=token_ids).delete()[1].get(OutstandingToken._meta.label, 0)
+            last_id = token_ids[-1]
+            batch_count += 1
+            if len(token_ids) < options['batch_size']:
+               break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {outstanding_deleted} outstanding and {blacklisted_deleted} blacklisted tokens '
+            f'in {batch_count} batches, {time.monotonic() - started_at:.2f}s'
+        ))
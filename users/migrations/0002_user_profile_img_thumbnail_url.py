@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_img_thumbnail_url',
+            field=models.URLField(null=True),
+        ),
+    ]
@@ -35,6 +35,8 @@ class User(AbstractUser):
     is_male = models.BooleanField(null=True, default=True)
     location = models.CharField(max_length=30, unique=False, null=True)
     profile_img_url = models.URLField(max_length=200, unique=False, null=True) 
+    profile_img_thumbnail_url = models.URLField(max_length=200, unique=False, null=True)
+    profile_img_medium_url = models.URLField(max_length=200, unique=False, null=True)
     country = models.ForeignKey(Country, related_name='user', null=True, on_delete=models.CASCADE)
     last_login = models.DateTimeField(auto_now=True) 
     created_at = models.DateTimeField(auto_now_add=True)
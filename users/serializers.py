@@ -2,13 +2,16 @@ from rest_framework import serializers
 from users.models import User, Country 
 from drf_writable_nested.serializers import WritableNestedModelSerializer
 from dj_rest_auth.registration.serializers import RegisterSerializer
+from utils import NameLookupCache
+
+country_cache = NameLookupCache(Country)
 
 class CountryRetrieveSerializer(serializers.RelatedField):
     def to_representation(self, value):
         return value.name
     def to_internal_value(self, data):
         try :
-          return Country.objects.get(name=data['name'])
+          return country_cache.get(data['name'])
         except Country.DoesNotExist:
           raise ValueError('Matching country does not exist') 
     def get_queryset(self, *args):
@@ -23,9 +26,16 @@ class UserReadSerializer(serializers.ModelSerializer):
     gender = serializers.SerializerMethodField()
     # country = CountryReadSerializer() 
     country = serializers.SerializerMethodField()
+    # Profile pages show the medium variant like gather room images do, the upload stays reachable
+    profile_img_url = serializers.SerializerMethodField()
+    original_profile_img_url = serializers.SerializerMethodField()
     class Meta:
         model = User
-        fields = ['id', 'nickname', 'age', 'gender', 'location', 'profile_img_url', 'country']
+        fields = ['id', 'nickname', 'age', 'gender', 'location', 'profile_img_url', 'original_profile_img_url', 'country']
+    def get_profile_img_url(self, obj):
+        return obj.profile_img_medium_url or obj.profile_img_url
+    def get_original_profile_img_url(self, obj):
+        return obj.profile_img_url
     def get_gender(self, obj): 
         gender = 'male' if obj.is_male else 'female'
         return gender 
@@ -34,14 +44,20 @@ class UserReadSerializer(serializers.ModelSerializer):
         return country 
 
 class CreatorSerializer(serializers.ModelSerializer):
+    profile_img_url = serializers.SerializerMethodField()
     class Meta:
         model = User
         fields = ['id', 'name', 'profile_img_url']
+    def get_profile_img_url(self, obj):
+        return obj.profile_img_thumbnail_url or obj.profile_img_url
 
 class ParticipantSerializer(serializers.ModelSerializer):
+    profile_img_url = serializers.SerializerMethodField()
     class Meta:
         model = User
         fields = ['id', 'profile_img_url']
+    def get_profile_img_url(self, obj):
+        return obj.profile_img_thumbnail_url or obj.profile_img_url
 
 class UserUpdateSerializer(WritableNestedModelSerializer): 
     country = CountryRetrieveSerializer()
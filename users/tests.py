@@ -1,3 +1,246 @@
-from django.test import TestCase
+from allauth.socialaccount.models import SocialAccount, SocialApp
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import parse_qs
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient, RequestFactory, TestCase
+from django.utils import timezone
+from moto import mock_s3
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from foreatown.models import ImageUploadJob
+from users.authentication import CachedJWTAuthentication
+from users.kakao import KakaoClient, set_kakao_client
+from users.models import Country, User
+from users.serializers import CreatorSerializer, country_cache
+from utils import S3Client, set_s3_client
+import json, threading
 
-# Create your tests here.
+class CountryLookupCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.country = Country.objects.create(name='Korea')
+    def test_lookup_is_served_from_cache(self):
+        with self.assertNumQueries(1):
+            country_cache.get('Korea')
+        with self.assertNumQueries(0):
+            self.assertEqual(country_cache.get('Korea'), self.country)
+    def test_save_invalidates_cached_lookup(self):
+        country_cache.get('Korea')
+        with self.captureOnCommitCallbacks(execute=True):
+            Country.objects.create(name='Japan')
+            # Still served from the cache until the write commits
+            with self.assertNumQueries(0):
+                country_cache.get('Korea')
+        with self.assertNumQueries(1):
+            country_cache.get('Korea')
+
+@mock_s3
+class ProfileImageVariantTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.country = Country.objects.create(name='Korea')
+        self.user = User.objects.create_user('user@foreatown.com', 'password', name='user')
+        self.s3_client = S3Client('testing', 'testing', 'foreatown-test')
+        self.s3_client.s3_client.create_bucket(Bucket='foreatown-test')
+        set_s3_client(self.s3_client)
+    def tearDown(self):
+        set_s3_client(None)
+    def test_profile_update_stores_image_variants(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 1000)).save(buffer, format='JPEG')
+        self.client.force_authenticate(self.user)
+        object_key = self.client.post('/users/myinfo/profile-image/upload-url', {'content_type': 'image/jpeg'}).data[0]['object_key']
+        self.s3_client.upload_bytes(buffer.getvalue(), 'image/jpeg', object_key)
+        response = self.client.patch('/users/myinfo', {
+            'nickname': 'nickname',
+            'age': 25,
+            'is_male': True,
+            'location': 'Seoul',
+            'country': 'Korea',
+            'profile_image_key': object_key
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ImageUploadJob.objects.get().status, ImageUploadJob.PENDING)
+        call_command('process_image_upload_jobs', once=True, concurrency=1, stdout=StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_img_url, self.s3_client.object_url(object_key))
+        thumbnail = Image.open(BytesIO(self.s3_client.download(self.s3_client.object_key_from_url(self.user.profile_img_thumbnail_url))))
+        self.assertEqual(thumbnail.size, (200, 200))
+        medium = Image.open(BytesIO(self.s3_client.download(self.s3_client.object_key_from_url(self.user.profile_img_medium_url))))
+        self.assertEqual(medium.size, (800, 800))
+        self.assertEqual(CreatorSerializer(self.user).data['profile_img_url'], self.user.profile_img_thumbnail_url)
+        response = self.client.get(f'/users/myinfo/{self.user.id}')
+        self.assertEqual(response.data['profile_img_url'], self.user.profile_img_medium_url)
+        self.assertEqual(response.data['original_profile_img_url'], self.user.profile_img_url)
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.country = Country.objects.create(name='Korea')
+        self.user = User.objects.create_user('user@foreatown.com', 'password', name='user', country=self.country)
+        self.access_token = str(RefreshToken.for_user(self.user).access_token)
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+    def test_user_is_served_from_cache(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.country.name, 'Korea')
+    def test_password_hash_is_not_cached(self):
+        self.authenticate()
+        user = self.authenticate()
+        self.assertNotIn('password', user.__dict__)
+        self.assertTrue(user.check_password('password'))
+    def test_profile_update_invalidates_cached_user(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/users/myinfo', {
+                'nickname': 'nickname',
+                'age': 25,
+                'is_male': True,
+                'location': 'Seoul',
+                'country': 'Korea'
+            }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().nickname, 'nickname')
+    def test_admin_change_invalidates_cached_user(self):
+        self.authenticate()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+    def test_blacklisted_refresh_token_invalidates_cached_user(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            RefreshToken.for_user(self.user).blacklist()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+class PruneJWTTokensTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user@foreatown.com', 'password', name='user')
+        now = timezone.now()
+        self.expired_tokens = [self.create_token(f'expired-{i}', now - timedelta(days=2)) for i in range(3)]
+        BlacklistedToken.objects.create(token=self.expired_tokens[0])
+        self.recently_expired_token = self.create_token('recently-expired', now - timedelta(minutes=10))
+        self.valid_token = self.create_token('valid', now + timedelta(days=1))
+        BlacklistedToken.objects.create(token=self.valid_token)
+    def create_token(self, jti, expires_at):
+        return OutstandingToken.objects.create(user=self.user, jti=jti, token=jti, created_at=expires_at - timedelta(days=7), expires_at=expires_at)
+    def test_prune_deletes_expired_tokens_in_batches(self):
+        out = StringIO()
+        call_command('prune_jwt_tokens', batch_size=2, sleep=0, stdout=out)
+        self.assertIn('Deleted 3 outstanding and 1 blacklisted tokens in 2 batches', out.getvalue())
+        self.assertQuerysetEqual(OutstandingToken.objects.order_by('id'), [self.recently_expired_token, self.valid_token])
+        self.assertEqual(BlacklistedToken.objects.get().token, self.valid_token)
+    def test_prune_resumes_after_max_batches(self):
+        call_command('prune_jwt_tokens', batch_size=2, sleep=0, max_batches=1, stdout=StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 3)
+        call_command('prune_jwt_tokens', batch_size=2, sleep=0, stdout=StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+
+class MockKakaoHandler(BaseHTTPRequestHandler):
+    # Kakao's token and profile endpoints, keeping connections alive like the real service
+    protocol_version = 'HTTP/1.1'
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        self.server.requests.append(('token', self.client_address))
+        if self.path != '/oauth/token' or form.get('code') != ['valid-code']:
+           return self.send_json(400, {'error': 'invalid_grant', 'error_description': 'authorization code not found'})
+        self.send_json(200, {'access_token': 'kakao-access-token', 'token_type': 'bearer'})
+    def do_GET(self):
+        self.server.requests.append(('profile', self.client_address))
+        if self.path != '/v2/user/me' or self.headers['Authorization'] != 'Bearer kakao-access-token':
+           return self.send_json(401, {'msg': 'this access token does not exist', 'code': -401})
+        self.send_json(200, self.server.profile)
+    def send_json(self, status_code, data):
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, format, *args):
+        pass
+
+class KakaoLoginTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), MockKakaoHandler)
+        cls.server.daemon_threads = True
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+    def setUp(self):
+        self.server.requests = []
+        self.server.profile = {
+            'id': 1234,
+            'kakao_account': {
+                'email': 'kakao@foreatown.com',
+                'is_email_verified': True,
+                'profile': {'nickname': 'kakao', 'profile_image_url': 'https://k.kakaocdn.net/profile.jpg'}
+            }
+        }
+        site, _ = Site.objects.update_or_create(id=settings.SITE_ID, defaults={'domain': 'testserver', 'name': 'testserver'})
+        SocialApp.objects.create(provider='kakao', name='kakao', client_id='kakao-key').sites.add(site)
+        server_url = f'http://127.0.0.1:{self.server.server_port}'
+        set_kakao_client(KakaoClient(auth_url=server_url, api_url=server_url, rest_api_key='kakao-key', redirect_uri='http://testserver/callback'))
+    def tearDown(self):
+        set_kakao_client(None)
+    def test_login_signs_up_new_user_in_process(self):
+        response = self.client.post('/users/kakao/login/', {'code': 'valid-code'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', response.json())
+        self.assertNotIn('user', response.json())
+        user = User.objects.get(email='kakao@foreatown.com')
+        self.assertEqual((user.name, user.sns_type, user.profile_img_url), ('kakao', '카카오톡', 'https://k.kakaocdn.net/profile.jpg'))
+        self.assertEqual(SocialAccount.objects.get(user=user).provider, 'kakao')
+        # One call per endpoint, the adapter reuses the fetched profile
+        self.assertEqual([endpoint for endpoint, _ in self.server.requests], ['token', 'profile'])
+    def test_login_reuses_pooled_connection(self):
+        self.client.post('/users/kakao/login/', {'code': 'valid-code'}, content_type='application/json')
+        self.server.profile['kakao_account']['profile']['profile_image_url'] = 'https://k.kakaocdn.net/new.jpg'
+        response = self.client.post('/users/kakao/login/', {'code': 'valid-code'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get(email='kakao@foreatown.com').profile_img_url, 'https://k.kakaocdn.net/new.jpg')
+        self.assertEqual(len({client_address for _, client_address in self.server.requests}), 1)
+    def test_login_rejects_invalid_code(self):
+        response = self.client.post('/users/kakao/login/', {'code': 'expired-code'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['ERROR_MESSAGE'], 'authorization code not found')
+        self.assertFalse(User.objects.exists())
+    def test_login_rejects_email_of_non_sns_user(self):
+        User.objects.create_user('kakao@foreatown.com', 'password', name='user')
+        response = self.client.post('/users/kakao/login/', {'code': 'valid-code'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SocialAccount.objects.exists())
+    def test_finish_endpoint_rolls_back_partial_signup(self):
+        self.client.raise_request_exception = False
+        with mock.patch.object(SocialAccount, 'save', side_effect=RuntimeError('social account write failed')):
+            response = self.client.post('/users/kakao/login/finish/', {'access_token': 'kakao-access-token'})
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(User.objects.filter(email='kakao@foreatown.com').exists())
+    async def test_async_login_signs_up_new_user(self):
+        response = await AsyncClient().post('/users/kakao/login/async/', {'code': 'valid-code'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', response.json())
+        self.assertEqual([endpoint for endpoint, _ in self.server.requests], ['token', 'profile'])
@@ -1,13 +1,17 @@
+from django.db import transaction
 from django.urls import path, include
-from users.views import CountryListAPI, KakaoLogin, kakao_login, MyUserInfoAPI, LoginAPI, SignupAPI
+from users.views import CountryListAPI, KakaoLogin, async_kakao_login, kakao_login, MyUserInfoAPI, LoginAPI, SignupAPI
 
 urlpatterns = [
     path('country/list', CountryListAPI.as_view({'get': 'list'}), name='country_list'),
     path('myinfo', MyUserInfoAPI.as_view({'patch': 'partial_update'}), name='user_info'),
+    path('myinfo/profile-image/upload-url', MyUserInfoAPI.as_view({'post': 'presigned_upload'}), name='user_profile_image_upload_url'),
     path('myinfo/<int:user_id>', MyUserInfoAPI.as_view({'get': 'retrieve'}), name='public_user_info'),
     path('', include('dj_rest_auth.urls')),
     path('login', LoginAPI.as_view(), name='login'),
     path('signup', SignupAPI.as_view(), name='signup'),
     path('kakao/login/', kakao_login, name='kakao_login'),
-    path('kakao/login/finish/', KakaoLogin.as_view(), name='kakao_login_todjango'),
+    path('kakao/login/async/', async_kakao_login, name='async_kakao_login'),
+    # The social login writes the user, email address and social account together
+    path('kakao/login/finish/', transaction.atomic(KakaoLogin.as_view()), name='kakao_login_todjango'),
 ]
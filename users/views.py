@@ -6,32 +6,32 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework_simplejwt.settings import (api_settings as jwt_settings,)
 from allauth.socialaccount.models import SocialAccount
-from allauth.socialaccount.providers.kakao import views as kakao_views
 from allauth.socialaccount.providers.oauth2.client import OAuth2Client
 from dj_rest_auth.registration.views import SocialLoginView, RegisterView, LoginView
 from dj_rest_auth.jwt_auth import set_jwt_cookies
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
-from json.decoder import JSONDecodeError
 from myforeatown.settings import SIMPLE_JWT
-from utils import S3Client 
+from foreatown.image_jobs import enqueue_image_upload_jobs, spool_image_file, uploaded_image
+from foreatown.models import ImageUploadJob
+from users.authentication import invalidate_cached_user
+from users.kakao import PooledKakaoOAuth2Adapter, get_async_kakao_client, get_kakao_client
+from utils import ConditionalGetMixin, PresignedUploadMixin, ReplicaReadMixin, get_cache_version, get_s3_client
 
-import requests, json
+import json
 
 # SNS Login
 kakao_redirect_uri = getattr(settings, 'KAKAO_CALLBACK_URI')
-kakao_rest_api_key = getattr(settings, 'KAKAO_RESTAPI_KEY')
-service_base_url = getattr(settings, 'SERVICE_BASE_URL')
 
-# AWS S3 
-AWS_ACCESS_KEY_ID = getattr(settings, 'AWS_ACCESS_KEY_ID')
-AWS_SECRET_ACCESS_KEY = getattr(settings, 'AWS_SECRET_ACCESS_KEY')
-AWS_S3_BUCKET_NAME = getattr(settings, 'AWS_S3_BUCKET_NAME')
-
-class CountryListAPI(ModelViewSet):
+class CountryListAPI(ReplicaReadMixin, ConditionalGetMixin, ModelViewSet):
     serializer_class = CountryReadSerializer
+    def list(self, request, *args, **kwargs):
+        # Any save or delete on Country bumps the lookup cache version, which makes the validator free
+        return self.conditional_response(request, [get_cache_version(country_cache.namespace)], lambda: super(CountryListAPI, self).list(request, *args, **kwargs))
     def get_queryset(self): 
         try: 
           queryset = Country.objects.all()
@@ -43,10 +43,12 @@ class CountryListAPI(ModelViewSet):
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
 
-class MyUserInfoAPI(ModelViewSet):
+class MyUserInfoAPI(ReplicaReadMixin, ConditionalGetMixin, PresignedUploadMixin, ModelViewSet):
     queryset = User.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]   
-    s3_client = S3Client(AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_S3_BUCKET_NAME)
+    @property
+    def s3_client(self):
+        return get_s3_client()
     def get_object(self): 
         queryset = self.get_queryset()
         if self.action == 'retrieve':
@@ -61,28 +63,46 @@ class MyUserInfoAPI(ModelViewSet):
            return UserReadSerializer 
     def retrieve(self, request, *args, **kwargs):
         try:
-          instance = self.get_object()
-          serializer = self.get_serializer(instance)
-          return Response(serializer.data)
+          updated_at = get_object_or_404(User.objects.filter(id=self.kwargs.get('user_id')).values_list('updated_at', flat=True))
+          # The country name is part of the body, its lookup cache version tracks renames
+          return self.conditional_response(request, [updated_at, get_cache_version(country_cache.namespace)], self.user_info_response, last_modified=updated_at)
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST) 
+    def user_info_response(self):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
     def partial_update(self, request, *args, **kwargs):
         try: 
           kwargs['partial'] = True
           partial = kwargs.pop('partial', False)
           user_instance = self.get_object()
-          json_data = self.formdata_to_json(request)
-          serializer = self.get_serializer(user_instance, data=json_data, partial=partial)
-          serializer.is_valid(raise_exception=True)
-          self.perform_update(serializer)
+          profile_image_upload = self.retrieve_profile_image_upload(request)
+          json_data = self.formdata_to_json(request, user_instance, profile_image_upload)
+          with transaction.atomic():
+              serializer = self.get_serializer(user_instance, data=json_data, partial=partial)
+              serializer.is_valid(raise_exception=True)
+              self.perform_update(serializer)
+              if profile_image_upload:
+                 enqueue_image_upload_jobs(ImageUploadJob.USER_PROFILE, [(user_instance.id, profile_image_upload)])
           if getattr(user_instance, '_prefetched_objects_cache', None):
              user_instance._prefetched_objects_cache = {}
           return Response(serializer.data)
         except Exception as e:
            return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST) 
-    def formdata_to_json(self, request): 
-        form_data = request.data
+    def retrieve_profile_image_upload(self, request):
+        profile_image_key = request.data.get('profile_image_key')
+        if profile_image_key:
+           self.s3_client.uploaded_object_url_list([profile_image_key], request.user.id)
+           return uploaded_image(profile_image_key)
         profile_image_file = request.FILES.get('profile_image')
+        if profile_image_file:
+           return spool_image_file(profile_image_file)
+        return None
+    def formdata_to_json(self, request, user_instance, profile_image_upload): 
+        form_data = request.data
+        # A new profile image replaces the current one once its upload job has finished
+        profile_img_url = user_instance.profile_img_url if profile_image_upload else None
         json_data = {
             'nickname': form_data['nickname'],
             'age': form_data['age'],
@@ -91,16 +111,22 @@ class MyUserInfoAPI(ModelViewSet):
             'country': {
                'name': form_data['country']
             },
-            'profile_img_url': self.s3_client.upload(profile_image_file) 
+            'profile_img_url': profile_img_url
         }
         return json_data
+    def perform_update(self, serializer):
+        profile_img_url = serializer.instance.profile_img_url
+        user_instance = serializer.save()
+        if user_instance.profile_img_url != profile_img_url:
+           User.objects.filter(id=user_instance.id).update(profile_img_medium_url=None, profile_img_thumbnail_url=None, updated_at=timezone.now())
 
 class SignupAPI(RegisterView):
     def create(self, request, *args, **kwargs):
         try: 
-          serializer = self.get_serializer(data=request.data)
-          serializer.is_valid(raise_exception=True)
-          user = self.perform_create(serializer)
+          with transaction.atomic():
+              serializer = self.get_serializer(data=request.data)
+              serializer.is_valid(raise_exception=True)
+              user = self.perform_create(serializer)
           headers = self.get_success_headers(serializer.data)
           data = self.get_response_data(user)
           if data:
@@ -167,53 +193,70 @@ def kakao_login(request):
     try :
       data = json.loads(request.body)
       authentication_code = data["code"]
-      access_token_json = requests.get(
-          f"https://kauth.kakao.com/oauth/token?grant_type=authorization_code&client_id={kakao_rest_api_key}&redirect_uri={kakao_redirect_uri}&code={authentication_code}").json()
-      error = access_token_json.get("error") 
-      if error: 
-         raise JSONDecodeError(error)
-      access_token = access_token_json.get("access_token") 
-      user_data_json = requests.get("https://kapi.kakao.com/v2/user/me", headers={'Authorization': 'Bearer {}'.format(access_token)}).json()
-      error = user_data_json.get("error")  
-      if error:
-         raise JSONDecodeError(error) 
-      kakao_account = user_data_json.get("kakao_account") 
-      email = kakao_account.get("email")
-      name = kakao_account.get("profile").get("nickname")
-      profile_image_url = kakao_account.get("profile").get("profile_image_url")
-      user = User.objects.get(email=email) 
-      social_user = SocialAccount.objects.filter(user=user).first()
-      if social_user is None:
-         raise ValueError('해당 이메일은 서비스에 존재하지만, SNS 유저가 아닙니다') 
-      if social_user.provider != 'kakao':
-         raise ValueError('해당 이메일은 이미', social_user.provider, 'SNS 계정으로 회원가입 되어 있습니다') 
-      data = {'access_token': access_token, 'code': authentication_code}
-      accept = requests.post(
-           f"{service_base_url}users/kakao/login/finish/", data=data)
-      accept_status = accept.status_code
-      if accept_status != 200:
-         raise ValueError('로그인에 실패했습니다. 다시 시도해주시기 바랍니다')
-      accept_json = accept.json()
-      accept_json.pop('user', None)
-      User.objects.filter(email=email).update(profile_img_url=profile_image_url)
+      kakao_client = get_kakao_client()
+      access_token = kakao_client.fetch_access_token(authentication_code)
+      user_data_json = kakao_client.fetch_profile(access_token)
+      return JsonResponse(finish_kakao_login(request, authentication_code, access_token, user_data_json))
+    except ValueError as v:
+        return JsonResponse({'ERROR_MESSAGE': v.args[0]}, status=status.HTTP_400_BAD_REQUEST) 
+    except Exception as e:
+        return JsonResponse({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+
+async def async_kakao_login(request):
+    # ASGI variant, the Kakao calls wait on the event loop and only the DB work takes a worker thread
+    try :
+      data = json.loads(request.body)
+      authentication_code = data["code"]
+      kakao_client = get_async_kakao_client()
+      access_token = await kakao_client.fetch_access_token(authentication_code)
+      user_data_json = await kakao_client.fetch_profile(access_token)
+      accept_json = await sync_to_async(finish_kakao_login)(request, authentication_code, access_token, user_data_json)
       return JsonResponse(accept_json)
-    except User.DoesNotExist:
-        data = {'access_token': access_token, 'code': authentication_code}
-        accept = requests.post(
-            f"{service_base_url}users/kakao/login/finish/", data=data)
-        accept_status = accept.status_code
-        if accept_status != 200:
-           raise ValueError('로그인에 실패했습니다. 다시 시도해주시기 바랍니다') 
-        accept_json = accept.json()
-        accept_json.pop('user', None)
-        User.objects.filter(email=email).update(name=name, password="", sns_type="카카오톡", profile_img_url=profile_image_url)
-        return JsonResponse(accept_json)
     except ValueError as v:
         return JsonResponse({'ERROR_MESSAGE': v.args[0]}, status=status.HTTP_400_BAD_REQUEST) 
     except Exception as e:
-           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)
+
+@transaction.atomic
+def finish_kakao_login(request, authentication_code, access_token, user_data_json):
+    kakao_account = user_data_json.get("kakao_account") 
+    email = kakao_account.get("email")
+    name = kakao_account.get("profile").get("nickname")
+    profile_image_url = kakao_account.get("profile").get("profile_image_url")
+    user = User.objects.filter(email=email).first()
+    if user is not None:
+       social_user = SocialAccount.objects.filter(user=user).first()
+       if social_user is None:
+          raise ValueError('해당 이메일은 서비스에 존재하지만, SNS 유저가 아닙니다') 
+       if social_user.provider != 'kakao':
+          raise ValueError('해당 이메일은 이미', social_user.provider, 'SNS 계정으로 회원가입 되어 있습니다') 
+    # The adapter reads the profile fetched above instead of asking Kakao again
+    request.kakao_profile = user_data_json
+    accept_json = KakaoLogin.finish_login(request, {'access_token': access_token, 'code': authentication_code})
+    accept_json.pop('user', None)
+    if user is not None:
+       User.objects.filter(email=email).update(profile_img_url=profile_image_url, profile_img_medium_url=None, profile_img_thumbnail_url=None, updated_at=timezone.now())
+       invalidate_cached_user(user.id)
+    else:
+       User.objects.filter(email=email).update(name=name, password="", sns_type="카카오톡", profile_img_url=profile_image_url, updated_at=timezone.now())
+    return accept_json
 
 class KakaoLogin(SocialLoginView):
-    adapter_class = kakao_views.KakaoOAuth2Adapter
+    adapter_class = PooledKakaoOAuth2Adapter
     client_class = OAuth2Client
-    callback_url = kakao_redirect_uri
\ No newline at end of file
+    callback_url = kakao_redirect_uri
+    @classmethod
+    def finish_login(cls, request, data):
+        # Runs the view's login in-process on kakao_login's request instead of a POST back into the service
+        view = cls()
+        view.setup(request)
+        view.headers = {}
+        view.format_kwarg = None
+        view.request = view.initialize_request(request)
+        view.serializer = view.get_serializer(data=data)
+        view.serializer.is_valid(raise_exception=True)
+        view.login()
+        response = view.get_response()
+        if response.status_code != status.HTTP_200_OK:
+           raise ValueError('로그인에 실패했습니다. 다시 시도해주시기 바랍니다')
+        return dict(response.data)
\ No newline at end of file
@@ -1,2 +1,8 @@
-from utils.s3 import S3Client
-from utils.pagination import GatherRoomListPagination
\ No newline at end of file
+from utils.s3 import S3Client, PresignedUploadMixin, get_s3_client, set_s3_client
+from utils.pagination import GatherRoomCursorPagination
+from utils.cache import NameLookupCache, get_cache_version, bump_cache_version, make_cache_key
+from utils.images import build_image_variants, create_image_variants
+from utils.geo import encode_geohash, geohash_prefix_filter, distance_km
+from utils.geocoding import GazetteerGeocoder, KakaoGeocoder, geocode_address, get_geocoder, set_geocoder
+from utils.conditional import ConditionalGetMixin
+from utils.db import DatabaseHealthCheckMiddleware, DatabaseRoutingMiddleware, ReplicaReadMixin, ReplicaRouter, primary_reads
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+import hashlib, time
+
+def get_cache_version(namespace):
+    # Versions never expire, a fresh one is seeded from the clock so that an evicted
+    # version can not fall back onto entries written under an older one
+    return cache.get_or_set(f'{namespace}:version', lambda: int(time.time() * 1000), None)
+
+def bump_cache_version(namespace):
+    try:
+        return cache.incr(f'{namespace}:version')
+    except ValueError:
+        return get_cache_version(namespace)
+
+def make_cache_key(namespace, *parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'{namespace}:{get_cache_version(namespace)}:{digest}'
+
+class NameLookupCache:
+    # Read-through cache for small lookup tables that are fetched by their name on writes.
+    # Any save or delete on the model bumps the namespace version once its transaction commits,
+    # dropping every cached entry. Bumped earlier, a concurrent read could cache the old row again.
+    def __init__(self, model, timeout=None):
+        self.model = model
+        self.timeout = timeout or getattr(settings, 'NAME_LOOKUP_CACHE_TIMEOUT', 60 * 60)
+        self.namespace = f'name_lookup:{model._meta.label_lower}'
+        post_save.connect(self.invalidate, sender=model, weak=False, dispatch_uid=self.namespace)
+        post_delete.connect(self.invalidate, sender=model, weak=False, dispatch_uid=self.namespace)
+    def get(self, name):
+        key = make_cache_key(self.namespace, name)
+        instance = cache.get(key)
+        if instance is None:
+           instance = self.model.objects.get(name=name)
+           cache.set(key, instance, self.timeout)
+        return instance
+    def invalidate(self, **kwargs):
+        transaction.on_commit(lambda: bump_cache_version(self.namespace))
@@ -0,0 +1,25 @@
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+import hashlib
+
+class ConditionalGetMixin:
+    # Answers GET with 304 when the validators match, the body is only built when they do not.
+    # Validators must be cheap to compute: version columns, updated_at or cache versions.
+    def conditional_response(self, request, etag_parts, get_response, last_modified=None):
+        etag_parts = [request.get_full_path(), request.user.id if request.user.is_authenticated else None, *etag_parts]
+        etag = quote_etag(hashlib.md5(':'.join(str(part) for part in etag_parts).encode('utf-8')).hexdigest())
+        last_modified_timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified_timestamp)
+        if response is None:
+           response = get_response()
+        if response.status_code == 304 or 200 <= response.status_code < 300:
+           response['ETag'] = etag
+           if last_modified_timestamp is not None:
+              response['Last-Modified'] = http_date(last_modified_timestamp)
+           # Personalized bodies may only be kept by the client, and every reuse is revalidated
+           if request.user.is_authenticated:
+              patch_cache_control(response, private=True, no_cache=True)
+           else:
+              patch_cache_control(response, public=True, no_cache=True)
+           patch_vary_headers(response, ['Authorization'])
+        return response
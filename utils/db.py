@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+import random, time
+
+class DatabaseHealthCheckMiddleware:
+    # Persistent connections can be dropped by the server while idle (MySQL wait_timeout). Only a
+    # connection this thread kept open and left idle for DATABASE_HEALTH_CHECK_IDLE_SECONDS is pinged
+    # before reuse. Busy connections and aliases that were never opened cost nothing, errors on the
+    # others are handled by close_if_unusable_or_obsolete at the end of the request.
+    def __init__(self, get_response):
+        self.get_response = get_response
+    def __call__(self, request):
+        now = time.monotonic()
+        idle_seconds = getattr(settings, 'DATABASE_HEALTH_CHECK_IDLE_SECONDS', 30)
+        for connection in connections.all():
+            if connection.connection is None or connection.in_atomic_block or not connection.settings_dict.get('CONN_HEALTH_CHECKS'):
+               continue
+            if now - getattr(connection, 'health_check_last_used', now) >= idle_seconds and not connection.is_usable():
+               connection.close()
+        try:
+            return self.get_response(request)
+        finally:
+            now = time.monotonic()
+            for connection in connections.all():
+                if connection.connection is not None:
+                   connection.health_check_last_used = now
+
+class RequestRouting:
+    # Routing state of the current request, ReplicaReadMixin picks the read database and ReplicaRouter records writes
+    def __init__(self):
+        self.read_database = None
+        self.wrote = False
+
+_request_routing = ContextVar('request_routing', default=None)
+
+def primary_pin_key(user_id):
+    return f'primary_pin:{user_id}'
+
+def pin_to_primary(user_id):
+    cache.set(primary_pin_key(user_id), True, getattr(settings, 'DATABASE_READ_YOUR_WRITES_SECONDS', 5))
+
+def replica_for_read(user):
+    # A user who wrote within the pin window reads the primary, a replica may not have the write yet
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    if not replicas:
+       return None
+    if user.is_authenticated and cache.get(primary_pin_key(user.id)):
+       return None
+    return random.choice(replicas)
+
+class DatabaseRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+    def __call__(self, request):
+        routing = RequestRouting()
+        token = _request_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_routing.reset(token)
+        user = getattr(request, 'user', None)
+        if routing.wrote and user is not None and user.is_authenticated:
+           pin_to_primary(user.id)
+        return response
+
+class ReplicaRouter:
+    # Within a request reads go to the replica chosen for it, if any, and every write goes to the primary.
+    # Outside of requests (commands, migrations) Django's default routing applies.
+    def db_for_read(self, model, **hints):
+        routing = _request_routing.get()
+        return routing.read_database if routing is not None else None
+    def db_for_write(self, model, **hints):
+        routing = _request_routing.get()
+        if routing is None:
+           return None
+        routing.wrote = True
+        return DEFAULT_DB_ALIAS
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows, an instance read from one can be related to one from the primary
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+           return True
+        return None
+
+@contextmanager
+def primary_reads():
+    # Reads that fill a shared cache go to the primary, a lagging replica would put a pre-write
+    # page back into the cache under the version its invalidation just bumped
+    routing = _request_routing.get()
+    read_database = routing.read_database if routing is not None else None
+    if routing is not None:
+       routing.read_database = None
+    try:
+        yield
+    finally:
+        if routing is not None:
+           routing.read_database = read_database
+
+class ReplicaReadMixin:
+    # Read actions of the viewset query a replica, authentication and permission checks run on the primary before
+    replica_read_actions = ('list', 'retrieve')
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        routing = _request_routing.get()
+        if routing is not None and self.action in self.replica_read_actions:
+           routing.read_database = replica_for_read(request.user)
@@ -0,0 +1,68 @@
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+import math
+
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitude_range, longitude_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, bit_count, even = [], 0, 0, True
+    while len(geohash) < precision:
+        value_range, value = (longitude_range, longitude) if even else (latitude_range, latitude)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+           bits |= 1
+           value_range[0] = middle
+        else:
+           value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+           geohash.append(GEOHASH_BASE32[bits])
+           bits, bit_count = 0, 0
+    return ''.join(geohash)
+
+def geohash_cell_size(precision):
+    # (latitude, longitude) extent in degrees of a cell, longitude takes the extra bit on odd bit counts
+    total_bits = precision * 5
+    return 180.0 / 2 ** (total_bits // 2), 360.0 / 2 ** ((total_bits + 1) // 2)
+
+def geohash_precision_for_radius(latitude, radius_km):
+    # Longest prefix whose cell is at least radius_km on both sides, so the cell
+    # holding the center and its eight neighbours cover the whole circle
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        latitude_size, longitude_size = geohash_cell_size(precision)
+        longitude_km = longitude_size * KM_PER_DEGREE * math.cos(math.radians(latitude))
+        if latitude_size * KM_PER_DEGREE >= radius_km and longitude_km >= radius_km:
+           return precision
+    return 1
+
+def geohash_prefixes(latitude, longitude, radius_km):
+    precision = geohash_precision_for_radius(latitude, radius_km)
+    latitude_size, longitude_size = geohash_cell_size(precision)
+    prefixes = set()
+    for latitude_offset in (-1, 0, 1):
+        for longitude_offset in (-1, 0, 1):
+            neighbour_latitude = max(-90.0, min(90.0, latitude + latitude_offset * latitude_size))
+            neighbour_longitude = (longitude + longitude_offset * longitude_size + 180.0) % 360.0 - 180.0
+            prefixes.add(encode_geohash(neighbour_latitude, neighbour_longitude, precision))
+    return sorted(prefixes)
+
+def geohash_prefix_filter(latitude, longitude, radius_km, field_name='geohash'):
+    # Each prefix is an index range scan on the geohash column
+    prefix_filter = Q()
+    for prefix in geohash_prefixes(latitude, longitude, radius_km):
+        prefix_filter |= Q(**{f'{field_name}__startswith': prefix})
+    return prefix_filter
+
+def distance_km(latitude, longitude, latitude_field='latitude', longitude_field='longitude'):
+    # Haversine distance in km from a point to the row's coordinates, as a database expression
+    latitude_delta = Radians(latitude_field) - Value(math.radians(latitude))
+    longitude_delta = Radians(longitude_field) - Value(math.radians(longitude))
+    haversine = (Power(Sin(latitude_delta / 2), 2) +
+                 Value(math.cos(math.radians(latitude))) * Cos(Radians(latitude_field)) * Power(Sin(longitude_delta / 2), 2))
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(haversine), output_field=FloatField())
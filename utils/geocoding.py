@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+import logging, requests, threading
+
+logger = logging.getLogger(__name__)
+
+class GazetteerGeocoder:
+    # Offline stand-in matching the most specific known place name in an address, used in
+    # tests and when no Kakao key is configured
+    places = {
+        '서울': (37.5665, 126.9780), 'seoul': (37.5665, 126.9780),
+        '강남구': (37.5172, 127.0473), 'gangnam': (37.5172, 127.0473),
+        '마포구': (37.5663, 126.9019), 'mapo': (37.5663, 126.9019),
+        '홍대': (37.5563, 126.9236), 'hongdae': (37.5563, 126.9236),
+        '종로구': (37.5735, 126.9790), 'jongno': (37.5735, 126.9790),
+        '이태원': (37.5345, 126.9946), 'itaewon': (37.5345, 126.9946),
+        '부산': (35.1796, 129.0756), 'busan': (35.1796, 129.0756),
+        '해운대구': (35.1631, 129.1636), 'haeundae': (35.1631, 129.1636),
+        '인천': (37.4563, 126.7052), 'incheon': (37.4563, 126.7052),
+        '대구': (35.8714, 128.6014), 'daegu': (35.8714, 128.6014),
+        '대전': (36.3504, 127.3845), 'daejeon': (36.3504, 127.3845),
+        '광주': (35.1595, 126.8526), 'gwangju': (35.1595, 126.8526),
+        '제주': (33.4996, 126.5312), 'jeju': (33.4996, 126.5312),
+    }
+    def __init__(self, places=None):
+        if places is not None:
+           self.places = places
+    def geocode(self, address):
+        address = (address or '').lower()
+        matched_names = [name for name in self.places if name in address]
+        if not matched_names:
+           return None
+        return self.places[max(matched_names, key=len)]
+
+class KakaoGeocoder:
+    # Kakao Local address search, sharing one pooled session between requests
+    url = 'https://dapi.kakao.com/v2/local/search/address.json'
+    def __init__(self, api_key=None, timeout=None):
+        self.api_key = api_key or getattr(settings, 'KAKAO_RESTAPI_KEY')
+        self.timeout = timeout or getattr(settings, 'GEOCODER_TIMEOUT', 3)
+        self.session = requests.Session()
+    def geocode(self, address):
+        if not address:
+           return None
+        response = self.session.get(
+            self.url,
+            params={'query': address},
+            headers={'Authorization': f'KakaoAK {self.api_key}'},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        documents = response.json().get('documents')
+        if not documents:
+           return None
+        return float(documents[0]['y']), float(documents[0]['x'])
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None:
+       with _geocoder_lock:
+           if _geocoder is None:
+              _geocoder = import_string(getattr(settings, 'GEOCODER_CLASS'))()
+    return _geocoder
+
+def set_geocoder(geocoder):
+    global _geocoder
+    _geocoder = geocoder
+
+def geocode_address(address):
+    # (latitude, longitude) or None, a geocoder failure must never block saving the room
+    try:
+        return get_geocoder().geocode(address)
+    except Exception:
+        logger.exception('Geocoding failed for %r', address)
+        return None
@@ -0,0 +1,34 @@
+from django.conf import settings
+from io import BytesIO
+from PIL import Image, ImageOps
+from utils.s3 import get_s3_client
+
+# Longest edge in pixels of every resized variant, the untouched upload stays the original
+IMAGE_VARIANT_SIZES = {
+    'thumbnail': 200,
+    'medium': 800,
+}
+
+def build_image_variants(image_bytes):
+    image = ImageOps.exif_transpose(Image.open(BytesIO(image_bytes)))
+    if image.mode not in ('RGB', 'L'):
+       image = image.convert('RGB')
+    image_variants = {}
+    for variant_name, max_size in IMAGE_VARIANT_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail((max_size, max_size), Image.LANCZOS)
+        buffer = BytesIO()
+        variant.save(buffer, format='JPEG', quality=getattr(settings, 'IMAGE_VARIANT_QUALITY', 80), optimize=True, progressive=True)
+        image_variants[variant_name] = buffer.getvalue()
+    return image_variants
+
+def create_image_variants(img_url):
+    s3_client = get_s3_client()
+    object_key = s3_client.object_key_from_url(img_url)
+    if object_key is None:
+       return {}
+    image_variants = build_image_variants(s3_client.download(object_key))
+    return {
+        variant_name: s3_client.upload_bytes(variant_bytes, 'image/jpeg', f'{object_key}_{variant_name}')
+        for variant_name, variant_bytes in image_variants.items()
+    }
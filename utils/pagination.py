@@ -1,4 +1,96 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+import json
 
-class GatherRoomListPagination(PageNumberPagination):
-    page_size = 10
\ No newline at end of file
+class GatherRoomCursorPagination(BasePagination):
+    # Keyset pagination over the queryset's own ordering, which must end on a unique column.
+    # The next cursor holds the ordering values of the last row, so every page is an index
+    # range scan and rows inserted while scrolling never shift the following pages.
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    default_ordering = ('id',)
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+           queryset = queryset.filter(self.get_position_filter(position))
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+    def get_paginated_response(self, data):
+        return self.get_cursor_page_response(self.request, data, self.get_next_cursor())
+    def get_cursor_page_response(self, request, data, next_cursor):
+        # Also used for pages served from a cache, the next link always follows the current request
+        return Response(OrderedDict([
+            ('next', self.get_cursor_link(request, next_cursor)),
+            ('results', data)
+        ]))
+    def get_page_size(self, request):
+        try:
+           page_size = int(request.query_params[self.page_size_query_param])
+           if page_size > 0:
+              return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+           pass
+        return self.page_size
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(self.default_ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+           ordering.append('id')
+        return tuple(ordering)
+    def get_position_filter(self, position):
+        if len(position) != len(self.ordering):
+           raise NotFound('Invalid cursor')
+        position_filter = Q()
+        for index, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{field.lstrip("-")}__{lookup}': position[index]})
+            for previous_field, previous_value in zip(self.ordering[:index], position[:index]):
+                condition &= Q(**{previous_field.lstrip('-'): previous_value})
+            position_filter |= condition
+        return position_filter
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            value = instance
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            position.append(value)
+        return position
+    def get_next_cursor(self):
+        if not self.has_next:
+           return None
+        return self.encode_cursor(self.get_position(self.page[-1]))
+    def get_next_link(self):
+        return self.get_cursor_link(self.request, self.get_next_cursor())
+    def get_cursor_link(self, request, cursor):
+        if cursor is None:
+           return None
+        return replace_query_param(request.build_absolute_uri(), self.cursor_query_param, cursor)
+    def encode_cursor(self, position):
+        return urlsafe_b64encode(json.dumps(position, default=self.encode_position_value).encode('utf-8')).decode('ascii')
+    def encode_position_value(self, value):
+        # Keep full microsecond precision, a truncated datetime would repeat rows across pages
+        if isinstance(value, datetime):
+           return value.isoformat()
+        raise TypeError(f'{type(value).__name__} can not be used as a cursor position')
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+           return None
+        try:
+           return json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError):
+           raise NotFound('Invalid cursor')
@@ -1,24 +1,147 @@
-import boto3, uuid
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+import boto3, re, threading, uuid
+
+OBJECT_KEY_PATTERN = re.compile(r'^free[0-9a-f]{32}$')
+
+def issued_upload_cache_key(object_key):
+    return f'issued_upload:{object_key}'
 
 class S3Client:
     def __init__(self, access_key, secret_key, bucket_name):
-        boto3_s3 = boto3.client(
+        # boto3 sessions are not thread-safe but the clients they create are
+        boto3_s3 = boto3.session.Session().client(
             's3',
             aws_access_key_id     = access_key,
-            aws_secret_access_key = secret_key
+            aws_secret_access_key = secret_key,
+            config                = Config(
+                max_pool_connections = getattr(settings, 'AWS_S3_MAX_POOL_CONNECTIONS'),
+                retries              = { 'max_attempts' : getattr(settings, 'AWS_S3_MAX_ATTEMPTS'), 'mode' : 'standard' }
+            )
         )
         self.s3_client   = boto3_s3
         self.bucket_name = bucket_name
-    def upload(self, file):
-        try: 
-            file_id    = 'free' + str(uuid.uuid1()).replace('-', '')
-            extra_args = { 'ContentType' : file.content_type }
-            self.s3_client.upload_fileobj(
-                    file,
-                    self.bucket_name,
-                    file_id,
-                    ExtraArgs = extra_args
-            )
-            return f'https://{self.bucket_name}.s3.ap-northeast-2.amazonaws.com/{file_id}'
-        except:
-            return None
\ No newline at end of file
+        self.transfer_config = TransferConfig(
+            multipart_threshold = getattr(settings, 'AWS_S3_MULTIPART_CHUNKSIZE'),
+            multipart_chunksize = getattr(settings, 'AWS_S3_MULTIPART_CHUNKSIZE'),
+            max_concurrency     = getattr(settings, 'AWS_S3_MAX_CONCURRENCY')
+        )
+        # Shared by every request in the process, so concurrent existence checks stay bounded
+        self.check_executor = ThreadPoolExecutor(
+            max_workers        = getattr(settings, 'AWS_S3_UPLOAD_WORKERS'),
+            thread_name_prefix = 's3-check'
+        )
+    def new_object_key(self):
+        return 'free' + str(uuid.uuid4()).replace('-', '')
+    def object_url(self, object_key):
+        return f'https://{self.bucket_name}.s3.ap-northeast-2.amazonaws.com/{object_key}'
+    def object_key_from_url(self, object_url):
+        prefix = self.object_url('')
+        if not object_url or not object_url.startswith(prefix):
+           return None
+        return object_url[len(prefix):]
+    def upload_fileobj(self, fileobj, object_key, content_type):
+        extra_args = { 'ContentType' : content_type }
+        self.s3_client.upload_fileobj(
+                fileobj,
+                self.bucket_name,
+                object_key,
+                ExtraArgs = extra_args,
+                Config    = self.transfer_config
+        )
+        return self.object_url(object_key)
+    def upload_bytes(self, data, content_type, object_key):
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=object_key, Body=data, ContentType=content_type)
+        return self.object_url(object_key)
+    def download(self, object_key):
+        return self.s3_client.get_object(Bucket=self.bucket_name, Key=object_key)['Body'].read()
+    def generate_presigned_upload(self, content_type, user_id):
+        # Clients POST the file straight to S3 with these fields, then send back object_key.
+        # The key is recorded for the user it was issued to, only they can attach the object later
+        if not content_type or not content_type.startswith('image/'):
+           raise ValueError('Only image uploads are allowed')
+        object_key     = self.new_object_key()
+        presigned_post = self.s3_client.generate_presigned_post(
+                self.bucket_name,
+                object_key,
+                Fields     = { 'Content-Type' : content_type },
+                Conditions = [
+                    { 'Content-Type' : content_type },
+                    ['content-length-range', 1, getattr(settings, 'AWS_S3_PRESIGNED_MAX_SIZE')]
+                ],
+                ExpiresIn  = getattr(settings, 'AWS_S3_PRESIGNED_EXPIRES_IN')
+        )
+        cache.set(issued_upload_cache_key(object_key), user_id, getattr(settings, 'AWS_S3_ISSUED_UPLOAD_TIMEOUT'))
+        return {
+            'object_key' : object_key,
+            'url'        : presigned_post['url'],
+            'fields'     : presigned_post['fields']
+        }
+    def object_exists(self, object_key):
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+               return False
+            raise
+    def consume_issued_uploads(self, object_keys):
+        # Dropped once the caller's transaction commits, so a key is attached once. A rolled back save keeps it usable
+        cache_keys = [issued_upload_cache_key(object_key) for object_key in object_keys]
+        if cache_keys:
+           transaction.on_commit(lambda: cache.delete_many(cache_keys))
+    def uploaded_object_url_list(self, object_keys, user_id):
+        for object_key in object_keys:
+            if not OBJECT_KEY_PATTERN.match(object_key):
+               raise ValueError(f'Invalid object key: {object_key}')
+        issued_user_ids = cache.get_many([issued_upload_cache_key(object_key) for object_key in object_keys])
+        for object_key in object_keys:
+            if issued_user_ids.get(issued_upload_cache_key(object_key)) != user_id:
+               raise ValueError(f'Object key was not issued to this user: {object_key}')
+        futures = [self.check_executor.submit(self.object_exists, object_key) for object_key in object_keys]
+        for object_key, future in zip(object_keys, futures):
+            if not future.result():
+               raise ValueError(f'Uploaded object does not exist: {object_key}')
+        return [self.object_url(object_key) for object_key in object_keys]
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+def get_s3_client():
+    # One client per process, created on first use so importing views needs no credentials
+    global _s3_client
+    if _s3_client is None:
+       with _s3_client_lock:
+           if _s3_client is None:
+              _s3_client = S3Client(
+                  getattr(settings, 'AWS_ACCESS_KEY_ID'),
+                  getattr(settings, 'AWS_SECRET_ACCESS_KEY'),
+                  getattr(settings, 'AWS_S3_BUCKET_NAME')
+              )
+    return _s3_client
+
+def set_s3_client(s3_client):
+    # Swap the shared client, e.g. for a stub in tests. None makes the next call build a new one
+    global _s3_client
+    _s3_client = s3_client
+
+class PresignedUploadMixin:
+    # Viewset action handing out presigned POSTs, the view must provide an s3_client
+    max_presigned_upload_count = 10
+    def presigned_upload(self, request, *args, **kwargs):
+        try:
+           upload_count = int(request.data.get('count', 1))
+           if upload_count < 1 or upload_count > self.max_presigned_upload_count:
+              raise ValueError(f'Upload count must be between 1 and {self.max_presigned_upload_count}')
+           content_type = request.data.get('content_type')
+           presigned_uploads = [self.s3_client.generate_presigned_upload(content_type, request.user.id) for _ in range(upload_count)]
+           return Response(presigned_uploads, status=status.HTTP_200_OK)
+        except Exception as e:
+           return Response({'ERROR_MESSAGE': e.args}, status=status.HTTP_400_BAD_REQUEST)